@@ -1,8 +1,9 @@
 from flask import Flask, request, abort
-import json
+import os
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from jwks import JWKSCache
 
 
 app = Flask(__name__)
@@ -10,6 +11,9 @@ app = Flask(__name__)
 AUTH0_DOMAIN = @TODO_REPLACE_WITH_YOUR_DOMAIN
 ALGORITHMS = ['RS256']
 API_AUDIENCE = @TODO_REPLACE_WITH_YOUR_API_AUDIENCE
+JWKS_URL = os.getenv('JWKS_URL', f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+JWKS_TTL = 3600
+JWKS_MIN_REFETCH_INTERVAL = 30
 
 
 class AuthError(Exception):
@@ -51,9 +55,11 @@ def get_token_auth_header():
     return token
 
 
+# the same signing keys cache as the coffee shop backend, see jwks.py
+jwks_cache = JWKSCache(JWKS_URL, ttl=JWKS_TTL, min_refetch_interval=JWKS_MIN_REFETCH_INTERVAL)
+
+
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
     rsa_key = {}
     if 'kid' not in unverified_header:
@@ -62,15 +68,15 @@ def verify_decode_jwt(token):
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    key = jwks_cache.get_key(unverified_header['kid'])
+    if key:
+        rsa_key = {
+            'kty': key['kty'],
+            'kid': key['kid'],
+            'use': key['use'],
+            'n': key['n'],
+            'e': key['e']
+        }
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+from urllib.request import urlopen
+
+
+'''
+JWKSCache
+a process-wide store of the signing keys published at a /.well-known/jwks.json url
+
+    the keys are fetched once and kept in memory keyed by their kid for ttl seconds,
+    after the ttl the cached keys are still served while a background thread refetches them.
+    a token signed with an unknown kid (e.g. after a key rotation) forces a refetch,
+    at most once every min_refetch_interval seconds so bad tokens cannot flood the jwks url.
+    the lookups that have to wait for a fetch (no keys yet) share a single request to the jwks url.
+
+    this module is also copied unchanged into BasicFlaskAuth, which is installed on its own,
+    projects/test_shared_modules.py checks the copies are identical.
+    EXAMPLE
+        jwks_cache = JWKSCache('https://example.auth0.com/.well-known/jwks.json')
+        rsa_key = jwks_cache.get_key(unverified_header['kid'])
+'''
+class JWKSCache:
+    def __init__(self, url, ttl=3600, min_refetch_interval=30, timeout=5, background_refresh=True):
+        self.url = url
+        self.ttl = ttl
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.background_refresh = background_refresh
+        self.fetch_count = 0
+        self._keys = {}
+        self._fetched_at = None
+        self._last_forced_refetch = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        # held by the blocking fetches, so concurrent lookups without keys wait for one fetch
+        self._fetch_lock = threading.Lock()
+
+    '''
+    fetch()
+        downloads the jwks document and returns its keys as a dictionary keyed by kid
+    '''
+    def fetch(self):
+        with urlopen(self.url, timeout=self.timeout) as jsonurl:
+            jwks = json.loads(jsonurl.read())
+        self.fetch_count += 1
+        return {key['kid']: key for key in jwks['keys'] if 'kid' in key}
+
+    '''
+    refresh()
+        replaces the cached keys with freshly fetched ones
+    '''
+    def refresh(self):
+        keys = self.fetch()
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception:
+            # keep serving the cached keys, the next expired lookup retries
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    # returns how long ago the keys were fetched, None if there are no keys
+    def _age(self):
+        fetched_at = self._fetched_at
+        return None if fetched_at is None else time.monotonic() - fetched_at
+
+    # True if no keys can be served until they are fetched: there are none yet,
+    # or they expired and are not refreshed in the background
+    def _must_block(self):
+        age = self._age()
+        return age is None or (not self.background_refresh and age >= self.ttl)
+
+    # returns True if the keys were fetched by this call, or by the call it waited for
+    def _refresh_if_expired(self):
+        if self._must_block():
+            # the lookups arriving during the fetch wait for it instead of fetching the keys again
+            with self._fetch_lock:
+                if self._must_block():
+                    self.refresh()
+            return True
+
+        age = self._age()
+        # age is None if clear() was called meanwhile, the next lookup fetches the keys
+        if age is None or age < self.ttl:
+            return False
+
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+        return False
+
+    def _may_force_refetch(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._last_forced_refetch is not None and \
+                    now - self._last_forced_refetch < self.min_refetch_interval:
+                return False
+            self._last_forced_refetch = now
+            return True
+
+    '''
+    get_key(kid)
+        returns the jwk with the given kid, or None if the jwks url does not publish it
+    '''
+    def get_key(self, kid):
+        fetched = self._refresh_if_expired()
+        key = self._keys.get(kid)
+        if key is None and not fetched and self._may_force_refetch():
+            self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    '''
+    clear()
+        forgets the cached keys, the next lookup fetches them again
+    '''
+    def clear(self):
+        with self._lock:
+            self._keys = {}
+            self._fetched_at = None
+            self._last_forced_refetch = None
@@ -2,34 +2,66 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import io
+import csv
 import json
+import base64
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import babel.dates
+import functools
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify, session
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 import config
+from page_cache import PageCache, LRUCacheBackend
+from db_pool import PooledSQLAlchemy
+from sql_timing import init_sql_timing
 import sys
 import datetime
+import itertools
+from sqlalchemy import func
+from sqlalchemy.ext.associationproxy import association_proxy
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
+SEARCH_RESULTS_LIMIT = 50
+PAST_SHOWS_LIMIT = 50
+SHOWS_PER_PAGE = 30
+ARTISTS_PER_PAGE = 50
+MAX_PAGE_SIZE = 100
+MAX_BULK_SHOWS = 1000
+FORMATTED_DATETIMES_CACHE_SIZE = 4096
+
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
 
-db = SQLAlchemy(app)
+# the connection pool is configured by the DATABASE_POOL_* environment variables, see db_pool.py
+db = PooledSQLAlchemy(app)
+# the statement count and database time of each request are sent in the Server-Timing header
+init_sql_timing(app, db)
 
 # TODO: connect to a local postgresql database
 
 migrate = Migrate(app, db, compare_type=True)
 
+def create_page_cache_backend():
+  """ Pages are cached in memory, unless PAGE_CACHE_REDIS_URL is set to share them between processes """
+  redis_url = app.config.get('PAGE_CACHE_REDIS_URL')
+  if redis_url:
+    # redis is an optional dependency, it is only imported when it is configured
+    import redis
+    return redis.Redis.from_url(redis_url)
+  return LRUCacheBackend(app.config.get('PAGE_CACHE_SIZE', 512))
+
+page_cache = PageCache(create_page_cache_backend(), timeout=app.config.get('PAGE_CACHE_TIMEOUT'))
+
 #app.config['SQLALCHEMY_DATABASE_URI'] = app.config.getSQLALCHEMY_DATABASE_URI
 
 #print(app.config.SQLALCHEMY_DATABASE_URI)
@@ -39,25 +71,49 @@ migrate = Migrate(app, db, compare_type=True)
 #----------------------------------------------------------------------------#
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
-# Show can be implemented as a class
-Show = db.Table('Show', \
-db.Column('id', db.Integer, primary_key=True), \
-db.Column('artist', db.Integer, db.ForeignKey('Artist.id'), nullable=False),\
-db.Column('venue', db.Integer, db.ForeignKey('Venue.id'), nullable=False), \
-db.Column('start_time', db.String))
+class Show(db.Model):
+    __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_venue_start_time', 'venue', 'start_time'),
+        db.Index('ix_Show_artist_start_time', 'artist', 'start_time'),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # the columns keep their names "artist" and "venue", the attribute names are used by the relationships below
+    artist_id = db.Column('artist', db.Integer, db.ForeignKey('Artist.id'), nullable=False)
+    venue_id = db.Column('venue', db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    #start_time is a timestamp column so the database can split past and upcoming shows using the indexes above
+    start_time = db.Column(db.DateTime)
 
-# class Show(db.Model):
-#   __tablename__='Show'
-#   id = db.Column( db.Integer, primary_key=True)
-#   artist = db.Column( db.Integer, db.ForeignKey('Artist.id'), nullable=False)
-#   venue = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
-#   start_time = db.Column(db.String, nullable=False)
+    # lazy loading these relationships costs a query per show,
+    # so queries rendering many shows should eager load them e.g. options(db.joinedload(Show.artist))
+    artist = db.relationship('Artist', backref=db.backref('shows', lazy=True))
+    venue = db.relationship('Venue', backref=db.backref('shows', lazy=True))
 
+    @property
+    def artist_name(self):
+      return self.artist.name
+
+    @property
+    def artist_image_link(self):
+      return self.artist.image_link
+
+    @property
+    def venue_name(self):
+      return self.venue.name
+
+    @property
+    def venue_image_link(self):
+      return self.venue.image_link
 
-#changed start_time from a datetime column to string column so it can work with the included date filter
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_state_city_id', 'state', 'city', 'id'),
+    )
     # TODO change to  lower case
 
     id = db.Column(db.Integer, primary_key=True)
@@ -74,19 +130,24 @@ class Venue(db.Model):
     #upcoming_shows_count = db.Column(db.Integer, default=0) 
     # can be computed using a join no need to add a column
     #past_shows_count = db.Column(db.Integer, default=0)
-    genres = db.Column(db.String(120))
+    genre_rows = db.relationship('VenueGenre', cascade='all, delete-orphan')
+    # the list of genre names, e.g. venue.genres = ['Jazz', 'Folk']
+    genres = association_proxy('genre_rows', 'genre', creator=lambda genre: VenueGenre(genre=genre))
 
 
 
 
-    artists = db.relationship('Artist', secondary=Show, backref=db.backref('artists', lazy=True))
-    #shows = db.relationship('Show', backref='shows', lazy=True)
+    artists = db.relationship('Artist', secondary='Show', backref=db.backref('artists', lazy=True))
 
     #is this overkill too much relations among tables
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+    )
     #wanted to change to a lower case name
 
     id = db.Column(db.Integer, primary_key=True)
@@ -94,14 +155,33 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genre_rows = db.relationship('ArtistGenre', cascade='all, delete-orphan')
+    genres = association_proxy('genre_rows', 'genre', creator=lambda genre: ArtistGenre(genre=genre))
     website = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String())
-    #shows = db.relationship('Show', backref='shows', lazy=True)
-    #no need for shows column, you can get them using a join
+
+class VenueGenre(db.Model):
+    """ One row per genre of a venue, the (genre, venue) index finds the venues of a genre """
+    __tablename__ = 'VenueGenre'
+    __table_args__ = (
+        db.Index('ix_VenueGenre_genre_venue', 'genre', 'venue'),
+    )
+
+    venue_id = db.Column('venue', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True)
+    genre = db.Column(db.String(50), primary_key=True)
+
+class ArtistGenre(db.Model):
+    """ One row per genre of an artist, the (genre, artist) index finds the artists of a genre """
+    __tablename__ = 'ArtistGenre'
+    __table_args__ = (
+        db.Index('ix_ArtistGenre_genre_artist', 'genre', 'artist'),
+    )
+
+    artist_id = db.Column('artist', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True)
+    genre = db.Column(db.String(50), primary_key=True)
 
 
 # TODO: implement any missing fields, as a database migration using Flask-Migrate
@@ -109,32 +189,195 @@ class Artist(db.Model):
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+@functools.lru_cache(maxsize=64)
+def compile_datetime_format(format, locale):
+  """ This function parses a date format (a name in DATETIME_FORMATS or a babel pattern) and a locale once,
+  babel.dates.format_datetime would parse both again for every date it formats """
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+@functools.lru_cache(maxsize=FORMATTED_DATETIMES_CACHE_SIZE)
+def format_cached_datetime(date, format, locale):
+  pattern, locale = compile_datetime_format(format, locale)
+  return pattern.apply(date, locale)
+
+def format_datetime(value, format='medium', locale='en'):
+  """ This function is the datetime filter of the templates, start times are already datetimes
+  when they are loaded from the database, strings are still accepted and parsed.
+  The formatted strings are memoized, many shows share the same start time """
+  if value is None:
+    # a show without a start time
+    return ''
+  if isinstance(value, datetime.datetime):
+    date = value
+  else:
+    date = dateutil.parser.parse(value)
+  return format_cached_datetime(date, format, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
 
-# 
-def get_past_upcoming_shows(shows_list, format='%Y-%m-%d %H:%M:%S'):
-  """ This function receives a list of shows that were queried from "Show" relation,
-  it classifies them according to start_time attribute/column , comparing the start_time,
-  to the current time, it returns two lists, upcoming shows and past shows respectively """
+def cached_page(dependencies):
+  """ This decorator caches the page rendered by a view, dependencies is called with the view arguments and returns
+  the names of the data shown by the page (e.g. 'venue:3', 'shows'), the page is rendered again once
+  page_cache.invalidate() is called with one of them by the controllers that change that data """
+  def decorator(view):
+    @functools.wraps(view)
+    def wrapper(**kwargs):
+      # a page showing flashed messages is only meant for the current user
+      if session.get('_flashes'):
+        return view(**kwargs)
+      return page_cache.get_or_render(request.full_path, dependencies(**kwargs), lambda: view(**kwargs))
+    return wrapper
+  return decorator
+
+
+def get_past_upcoming_shows(filter_column, filter_id, related, past_limit=PAST_SHOWS_LIMIT):
+  """ This function gets the shows of a venue or an artist, filter_column is the column of "Show" relation
+  to filter by (Show.venue_id or Show.artist_id) and filter_id is the id of the venue or the artist,
+  related is the relationship displayed with each show (Show.artist or Show.venue), it is eager loaded
+  with the shows so rendering them does not issue a query per show.
+  The database splits the shows into past and upcoming by comparing start_time to the current time,
+  using the (venue, start_time) and (artist, start_time) indexes. It returns past shows (only the latest past_limit shows),
+  upcoming shows, count of past shows and count of upcoming shows respectively """
   now = datetime.datetime.now()
-  upcoming = []
-  past = []
-  for s in shows_list:
-    dt = datetime.datetime.strptime(s.start_time, format)
-    if dt < now:
-      past.append(s)
-    else:
-      upcoming.append(s)
-  return past, upcoming
+  is_past = Show.start_time < now
+  is_upcoming = Show.start_time >= now
+  past_count, upcoming_count = db.session.query(
+    func.count(db.case([(is_past, 1)])), func.count(db.case([(is_upcoming, 1)])))\
+    .filter(filter_column == filter_id).one()
+
+  shows = Show.query.options(db.joinedload(related)).filter(filter_column == filter_id)
+  upcoming = shows.filter(is_upcoming).order_by(Show.start_time).all()
+  past = shows.filter(is_past).order_by(Show.start_time.desc()).limit(past_limit).all()
+  return past, upcoming, past_count, upcoming_count
+
+
+def get_venues_by_area(genre=None):
+  """ This function returns all venues grouped by area (state, city), each venue has the number of its upcoming shows.
+  The venues and their upcoming shows counts are fetched using a single query, then they are grouped in python,
+  so the number of queries does not grow with the number of areas.
+  If genre is given only the venues of that genre are returned, they are found using the (genre, venue) index."""
+  now = datetime.datetime.now()
+  # count the upcoming shows of each venue, venues with no upcoming shows will not be in this subquery
+  upcoming_counts = db.session.query(Show.venue_id.label('venue_id'), func.count(Show.id).label('num_upcoming_shows'))\
+    .filter(Show.start_time >= now).group_by(Show.venue_id).subquery()
+
+  query = db.session.query(Venue.id, Venue.name, Venue.state, Venue.city,
+    func.coalesce(upcoming_counts.c.num_upcoming_shows, 0))\
+    .outerjoin(upcoming_counts, upcoming_counts.c.venue_id == Venue.id)
+  if genre:
+    query = query.join(VenueGenre).filter(VenueGenre.genre == genre)
+  rows = query.order_by(Venue.state, Venue.city, Venue.id).all()
+
+  areas = []
+  # rows are ordered by area, so each area is a consecutive group of rows
+  for (state, city), venues_in_area in itertools.groupby(rows, key=lambda row: (row[2], row[3])):
+    areas.append({
+      'state': state,
+      'city': city,
+      'venues': [{'id': id, 'name': name, 'num_upcoming_shows': num_upcoming_shows}
+        for id, name, _, _, num_upcoming_shows in venues_in_area]
+    })
+  return areas
+
+
+def search_by_name(model, search_term, limit=SEARCH_RESULTS_LIMIT):
+  """ This function searches the rows of model (Venue or Artist) whose name contains the search term (case-insensitive),
+  the results are ranked so that the best matches come first. It returns the results (at most limit rows)
+  and the count of all matching rows, both are fetched by a single query.
+  On postgresql the results are ranked by trigram similarity and the filter uses the trigram index on name,
+  on other databases (sqlite) the results are ranked by the position of the term in the name then by the name length."""
+  if db.engine.dialect.name == 'postgresql':
+    rank = [func.similarity(model.name, search_term).desc()]
+  else:
+    rank = [func.instr(func.lower(model.name), search_term.lower()), func.length(model.name)]
+
+  # count(*) over () is computed before the limit is applied, so it is the count of all matching rows
+  rows = db.session.query(model, func.count().over())\
+    .filter(model.name.ilike('%' + search_term + '%'))\
+    .order_by(*rank, model.id)\
+    .limit(limit).all()
+
+  results = [row[0] for row in rows]
+  count = rows[0][1] if rows else 0
+  return results, count
+
+
+def encode_cursor(values):
+  """ Encodes the sort key values of the last row of a page into an opaque url safe token """
+  values = [v.isoformat() if isinstance(v, datetime.datetime) else v for v in values]
+  return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor_value(value, column):
+  """ Converts a value decoded from a cursor to the python type of column (None stays None),
+  it raises ValueError if the value cannot be one, so a forged token never reaches the query """
+  if value is None:
+    return None
+  python_type = column.type.python_type
+  if python_type is datetime.datetime:
+    if not isinstance(value, str):
+      raise ValueError('cursor datetime must be a string')
+    return datetime.datetime.fromisoformat(value)
+  # json booleans are python ints
+  if not isinstance(value, python_type) or isinstance(value, bool):
+    raise ValueError('cursor value does not match the type of its column')
+  return value
+
+
+def decode_cursor(token, columns):
+  """ Decodes a token created by encode_cursor back into the sort key values of columns,
+  it aborts with 400 if the token is malformed """
+  try:
+    values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    if not isinstance(values, list) or len(values) != len(columns):
+      raise ValueError('cursor does not match the sort columns')
+    return [decode_cursor_value(value, column) for value, column in zip(values, columns)]
+  except (ValueError, TypeError):
+    abort(400)
+
+
+def get_page_size(default):
+  """ Reads the page size from the per_page query argument, limited to MAX_PAGE_SIZE """
+  per_page = request.args.get('per_page', default, type=int)
+  return max(1, min(per_page, MAX_PAGE_SIZE))
+
+
+def keyset_paginate(query, columns, after, per_page):
+  """ This function returns one page of the query ordered by columns, and the token of the next page (None on the last page).
+  Instead of an offset the page starts right after the row whose sort key is encoded in the after token,
+  so the database reads only one page using the index on columns however deep the page is.
+  The last column must be unique (the id) so the sort key identifies exactly one row.
+  The first column may be null: a comparison with null is never true and the databases sort nulls differently,
+  so the rows with a null first column are listed last on every database, ordered by the remaining columns."""
+  key, rest = columns[0], columns[1:]
+  cursor = decode_cursor(after, columns) if after else None
+  # fetch an extra row to know whether there is a next page
+  limit = per_page + 1
+  rows = []
+  if cursor is None or cursor[0] is not None:
+    keyed = query.filter(key.isnot(None)).order_by(*columns)
+    if cursor is not None:
+      keyed = keyed.filter(db.tuple_(*columns) > db.tuple_(*cursor))
+    rows = keyed.limit(limit).all()
+    # the page continues with the first rows whose key is null
+    cursor = None
+  if len(rows) < limit:
+    unkeyed = query.filter(key.is_(None)).order_by(*rest)
+    if cursor is not None:
+      unkeyed = unkeyed.filter(db.tuple_(*rest) > db.tuple_(*cursor[1:]))
+    rows += unkeyed.limit(limit - len(rows)).all()
+  next_token = None
+  if len(rows) > per_page:
+    rows = rows[:per_page]
+    last = rows[-1]
+    next_token = encode_cursor([getattr(last, c.key) for c in columns])
+  return rows, next_token
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -148,30 +391,18 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@cached_page(lambda: ['venues', 'shows'])
 def venues():
   """ This function generates a list of all distinct areas where venues are present according to state and city,
-  and for each area it generates the list of venues present int it."""
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
+  and for each area it generates the list of venues present int it, the genre query argument keeps only the venues of a genre."""
   data = []
+  genre = request.args.get('genre')
   try:
-    # get the distinct areas (state,city) of Venues
-    areas = db.session.query(Venue.state, Venue.city).distinct(Venue.state, Venue.city).all()
-
-    for area in areas:
-      area_dict = {}
-      state, city = area
-      venues_in_area = Venue.query.filter_by(state=state, city=city).all()
-      area_dict['state'] = state
-      area_dict['city'] = city
-      area_dict['venues'] = venues_in_area
-      data.append(area_dict)
-
-
+    data = get_venues_by_area(genre)
   except:
     print(sys.exc_info())
 
-  return render_template('pages/venues.html', areas=data)
+  return render_template('pages/venues.html', areas=data, genre=genre)
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
@@ -181,9 +412,7 @@ def search_venues():
   
   search_term = request.form.get('search_term', '')
 
-  query_res = Venue.query.filter(Venue.name.ilike('%' + search_term +'%'))
-  venues = query_res.all()
-  count = query_res.count()
+  venues, count = search_by_name(Venue, search_term)
   response = {}
 
   response['count'] = count
@@ -193,25 +422,21 @@ def search_venues():
   return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 @app.route('/venues/<int:venue_id>')
+@cached_page(lambda venue_id: [f'venue:{venue_id}', 'shows', 'artists'])
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
   # TODO: replace with real venue data from the venues table, using venue_id
   try:
-    venue = Venue.query.get(venue_id)
-    shows = db.session.query(Show).filter_by(venue=venue_id).join(Venue).all()
+    # the genres are loaded in the same query as the venue
+    venue = Venue.query.options(db.joinedload(Venue.genre_rows)).get(venue_id)
 
     data = venue.__dict__
-    past , upcoming = get_past_upcoming_shows(shows)
-    past_shows_count = len(past)
-    upcoming_shows_count = len(upcoming)
+    past, upcoming, past_shows_count, upcoming_shows_count = get_past_upcoming_shows(Show.venue_id, venue_id, Show.artist)
     data['past_shows_count'] = past_shows_count
     data['upcoming_shows_count'] = upcoming_shows_count
     data['past_shows'] = past
     data['upcoming_shows'] = upcoming
-    genres = data['genres']
-    genres = genres[1: len(genres)-1]
-    genres = genres.split(',')
-    data['genres'] = genres
+    data['genres'] = list(venue.genres)
     
   except:
     err = True
@@ -249,7 +474,7 @@ def create_venue_submission():
     venue.website = request.form['website']
 
     genres = request.form.getlist('genres')
-    venue.genres = ','.join(genres)
+    venue.genres = genres
   #if the checkbox is marked the request.form will have a 'seeking_talent' key with value = 'y' , otherwise there will be no key
     if request.form.get('seeking_talent', 'N') == 'y':
       venue.seeking_talent = True
@@ -258,6 +483,8 @@ def create_venue_submission():
       venue.seeking_description = request.form['seeking_description']
       db.session.add(venue)
       db.session.commit()
+      # a page cached while the venue id did not exist yet is stale too
+      page_cache.invalidate('venues', f'venue:{venue.id}')
   except:
     err = True
     db.session.rollback()
@@ -280,6 +507,7 @@ def delete_venue(venue_id):
   try:
     venue_to_delete = Venue.query.get(venue_id)
     db.session.delete(venue_to_delete)
+    page_cache.invalidate('venues', f'venue:{venue_id}')
   except:
     db.session.close()
   finally:
@@ -292,10 +520,16 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 @app.route('/artists')
 def artists():
-  # TODO: replace with real data returned from querying the database
-
-  data = Artist.query.all()
-  return render_template('pages/artists.html', artists=data)
+  """ This endpoint lists the artists ordered by name, one page at a time,
+  the after query argument is the token of the page to show, it is generated by the previous page,
+  the genre query argument keeps only the artists of a genre."""
+  per_page = get_page_size(ARTISTS_PER_PAGE)
+  genre = request.args.get('genre')
+  query = Artist.query
+  if genre:
+    query = query.join(ArtistGenre).filter(ArtistGenre.genre == genre)
+  data, next_token = keyset_paginate(query, [Artist.name, Artist.id], request.args.get('after'), per_page)
+  return render_template('pages/artists.html', artists=data, next_token=next_token, per_page=per_page, genre=genre)
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
@@ -309,9 +543,7 @@ def search_artists():
 
   search_term = request.form.get('search_term', '')
 
-  query_res = Artist.query.filter(Artist.name.ilike('%' + search_term +'%'))
-  artists = query_res.all()
-  count = query_res.count()
+  artists, count = search_by_name(Artist, search_term)
   response = {}
 
   response['count'] = count
@@ -319,32 +551,21 @@ def search_artists():
   return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 @app.route('/artists/<int:artist_id>')
+@cached_page(lambda artist_id: [f'artist:{artist_id}', 'shows', 'venues'])
 def show_artist(artist_id):
   """ This endpoint gets an artist from the database, and reformats the output of the query; adding necessary fields
   so it a specific template can be rendered."""
   # shows the venue page with the given venue_id
   # TODO: replace with real venue data from the venues table, using venue_id
-  artist = Artist.query.get(artist_id)
-  shows = db.session.query(Show).filter_by(artist=artist_id).join(Artist).all()
-  ## need to get show
-  
+  artist = Artist.query.options(db.joinedload(Artist.genre_rows)).get(artist_id)
 
   data = artist.__dict__
-  past , upcoming = get_past_upcoming_shows(shows)
-  past_shows_count = len(past)
-  upcoming_shows_count = len(upcoming)
+  past, upcoming, past_shows_count, upcoming_shows_count = get_past_upcoming_shows(Show.artist_id, artist_id, Show.venue)
   data['past_shows_count'] = past_shows_count
   data['upcoming_shows_count'] = upcoming_shows_count
   data['past_shows'] = past
   data['upcoming_shows'] = upcoming
-  print(data['genres'])
-  try:
-    genres = data['genres']
-    genres = genres[1: len(genres)-1]
-    genres = genres.split(',')
-    data['genres'] = genres
-  except:
-    print(sys.exc_info())
+  data['genres'] = list(artist.genres)
 
   return render_template('pages/show_artist.html', artist=data)
 
@@ -384,10 +605,11 @@ def edit_artist_submission(artist_id):
       artist_to_edit.seeking_venue = False
     artist_to_edit.seeking_description = request.form['seeking_description']
     genres = request.form.getlist('genres')
-    artist_to_edit.genres = ','.join(genres)
+    artist_to_edit.genres = genres
     
     #do not have to add the edited artist to session or else it will create a record
     db.session.commit()
+    page_cache.invalidate('artists', f'artist:{artist_id}')
   except:
     err = True
     db.session.rollback()
@@ -427,7 +649,7 @@ def edit_venue_submission(venue_id):
     venue.image_link = request.form['image_link']
     #venue.seeking_talent = request.form['seeking_talent']
     genres = request.form.getlist('genres')
-    venue.genres = ','.join(genres)
+    venue.genres = genres
     if request.form.get('seeking_talent', 'N') == 'y':
       venue.seeking_talent = True
     else:
@@ -436,6 +658,7 @@ def edit_venue_submission(venue_id):
     
     #commit the changes then close the session
     db.session.commit()
+    page_cache.invalidate('venues', f'venue:{venue_id}')
     db.session.close()
   except:
     err = True
@@ -480,10 +703,11 @@ def create_artist_submission():
     new_artist.seeking_description = request.form['seeking_description']
 
     genres = request.form.getlist('genres')
-    new_artist.genres = ','.join(genres)
+    new_artist.genres = genres
 
     db.session.add(new_artist)
     db.session.commit()
+    page_cache.invalidate('artists', f'artist:{new_artist.id}')
   except:
     err = True
     print(sys.exc_info())
@@ -509,19 +733,16 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@cached_page(lambda: ['shows', 'venues', 'artists'])
 def shows():
-  # displays list of shows at /shows
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-
-
-  #shows = Venue.query.join(Artist).filter(venue_id)
-  #need to write a query to get the shows
-  shows = db.session.query(Show).all()
-  print(shows)
-      
+  """ This endpoint lists the shows ordered by start time, one page at a time,
+  the after query argument is the token of the page to show, it is generated by the previous page."""
+  per_page = get_page_size(SHOWS_PER_PAGE)
+  # artists and venues are loaded in the same query as the shows
+  query = Show.query.options(db.joinedload(Show.artist), db.joinedload(Show.venue))
+  shows, next_token = keyset_paginate(query, [Show.start_time, Show.id], request.args.get('after'), per_page)
 
-  return render_template('pages/shows.html', shows=shows)
+  return render_template('pages/shows.html', shows=shows, next_token=next_token, per_page=per_page)
 
 @app.route('/shows/create')
 def create_shows():
@@ -542,15 +763,16 @@ def create_show_submission():
   try:
     venue_id = request.form['venue_id']
     artist_id = request.form['artist_id']
-    start_time = request.form['start_time']
+    start_time = dateutil.parser.parse(request.form['start_time'])
     #db.session.add()
     
     #venue = Venue.query.get(venue_id)
     #artist = Artist.query.get(artist_id)
     #venue.artists.append[artist]
-    insert_statement = Show.insert().values(artist=artist_id, venue=venue_id, start_time=start_time)
-    db.session.execute(insert_statement)
+    show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
+    db.session.add(show)
     db.session.commit()
+    page_cache.invalidate('shows')
   except:
     err = True
     db.session.rollback()
@@ -572,6 +794,105 @@ def create_show_submission():
 
   return render_template('pages/home.html')
 
+def parse_bulk_shows():
+  """ This function reads the rows of a bulk show upload, either a csv document with a header row
+  (artist_id,venue_id,start_time) or a json list of objects with the same keys, optionally wrapped in {"shows": [...]}.
+  Returns None if the body cannot be parsed."""
+  if request.mimetype == 'text/csv':
+    try:
+      return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    except csv.Error:
+      return None
+
+  data = request.get_json(silent=True)
+  if isinstance(data, dict):
+    data = data.get('shows')
+  if not isinstance(data, list):
+    return None
+  return data
+
+def validate_bulk_show(row):
+  """ This function returns (values, error), values are the column values of a new show and error is None,
+  or values is None and error describes why the row was rejected."""
+  if not isinstance(row, dict):
+    return None, 'malformed row'
+  try:
+    artist_id = int(row.get('artist_id'))
+    venue_id = int(row.get('venue_id'))
+  except (TypeError, ValueError):
+    return None, 'artist_id and venue_id must be integers'
+  try:
+    start_time = dateutil.parser.parse(str(row.get('start_time') or ''))
+  except (ValueError, OverflowError):
+    return None, 'start_time is not a valid date'
+  return {'artist': artist_id, 'venue': venue_id, 'start_time': start_time}, None
+
+@app.route('/shows/bulk', methods=['POST'])
+def create_shows_bulk():
+  """ This endpoint schedules many shows at once, e.g. a whole tour.
+  The artist and venue ids of all the rows are checked by one query, the valid rows are then inserted
+  by one executemany statement in a single transaction, and the response reports the outcome of every row.
+  If the insert fails nothing is inserted."""
+  rows = parse_bulk_shows()
+  if rows is None:
+    abort(400)
+  if len(rows) > MAX_BULK_SHOWS:
+    abort(413)
+
+  checked = [validate_bulk_show(row) for row in rows]
+  artist_ids = {values['artist'] for values, _ in checked if values}
+  venue_ids = {values['venue'] for values, _ in checked if values}
+
+  # one query looks up both the artist ids and the venue ids
+  existing = []
+  if artist_ids:
+    existing = db.session.query(db.literal('artist').label('kind'), Artist.id) \
+      .filter(Artist.id.in_(artist_ids)) \
+      .union_all(db.session.query(db.literal('venue'), Venue.id).filter(Venue.id.in_(venue_ids))) \
+      .all()
+  existing_artists = {id for kind, id in existing if kind == 'artist'}
+  existing_venues = {id for kind, id in existing if kind == 'venue'}
+
+  results = []
+  valid = []
+  for row_number, (values, error) in enumerate(checked, start=1):
+    if values and values['artist'] not in existing_artists:
+      values, error = None, 'unknown artist {}'.format(values['artist'])
+    elif values and values['venue'] not in existing_venues:
+      values, error = None, 'unknown venue {}'.format(values['venue'])
+
+    if values:
+      valid.append(values)
+      results.append({'row': row_number, 'status': 'created'})
+    else:
+      results.append({'row': row_number, 'status': 'rejected', 'error': error})
+
+  err = False
+  if valid:
+    try:
+      db.session.execute(Show.__table__.insert(), valid)
+      db.session.commit()
+      page_cache.invalidate('shows')
+    except:
+      err = True
+      db.session.rollback()
+      print(sys.exc_info())
+    finally:
+      db.session.close()
+
+  if err:
+    for result in results:
+      if result['status'] == 'created':
+        result.update(status='rejected', error='insert failed')
+
+  created = 0 if err else len(valid)
+  return jsonify({
+    'success': not err and created == len(results),
+    'created': created,
+    'rejected': len(results) - created,
+    'results': results
+  }), 500 if err else 200
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -0,0 +1,35 @@
+""" Helpers shared by the benchmarks, run them from the starter_code folder e.g.
+  python -m benchmarks.venues
+The benchmarks use an in-memory sqlite database unless BENCHMARK_DATABASE_URL is set,
+use a dedicated database as the benchmarks drop and recreate all the tables."""
+import os
+from contextlib import contextmanager
+from sqlalchemy import event
+
+BENCHMARK_DATABASE_URL = os.getenv('BENCHMARK_DATABASE_URL', 'sqlite://')
+
+
+def setup_benchmark_db(app, db, url=BENCHMARK_DATABASE_URL):
+  """ Points the app to the benchmark database (url) and creates a fresh schema, all the existing tables are dropped,
+  this has to be called before the app touches the database for the first time."""
+  app.config['SQLALCHEMY_DATABASE_URI'] = url
+  app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+  with app.app_context():
+    db.drop_all()
+    db.create_all()
+
+
+@contextmanager
+def count_statements(engine):
+  """ Counts the sql statements executed by the engine inside the with block,
+  the yielded list holds the count as its only element."""
+  counter = [0]
+
+  def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter[0] += 1
+
+  event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+  try:
+    yield counter
+  finally:
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
@@ -0,0 +1,40 @@
+""" Measures the datetime template filter against formatting every date with babel directly,
+with distinct dates (every call misses the memoized strings) and with repeated dates (as on the shows page).
+  python -m benchmarks.format_datetime"""
+import time
+import datetime
+import babel.dates
+from app import format_datetime, format_cached_datetime, DATETIME_FORMATS
+
+CALLS = 20000
+DISTINCT_DATES = 200
+
+
+def uncached_format_datetime(value, format='medium'):
+  return babel.dates.format_datetime(value, DATETIME_FORMATS.get(format, format), locale='en')
+
+
+def measure(function, dates, format):
+  started = time.perf_counter()
+  for date in dates:
+    function(date, format)
+  return (time.perf_counter() - started) / len(dates) * 1e6
+
+
+def main():
+  start = datetime.datetime(2030, 1, 1, 20, 0)
+  workloads = {
+    'distinct': [start + datetime.timedelta(minutes=i) for i in range(CALLS)],
+    'repeated': [start + datetime.timedelta(days=i % DISTINCT_DATES) for i in range(CALLS)]
+  }
+  print(f'{"workload":>10} {"format":>8} {"babel us/call":>14} {"filter us/call":>15} {"speedup":>8}')
+  for name, dates in workloads.items():
+    for format in DATETIME_FORMATS:
+      format_cached_datetime.cache_clear()
+      baseline = measure(uncached_format_datetime, dates, format)
+      filtered = measure(format_datetime, dates, format)
+      print(f'{name:>10} {format:>8} {baseline:>14.2f} {filtered:>15.2f} {baseline / filtered:>7.1f}x')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,283 @@
+""" Load test of every Fyyur route.
+
+Seeds a synthetic dataset, sends requests to each route from concurrent clients through the Flask test client,
+and reports the p50/p95/p99 latency, the throughput and the SQL statements per request of every route,
+both as a table and as a json file that a later run can be compared to.
+  python -m benchmarks.load --venues 10000 --artists 50000 --shows 1000000 --concurrency 8
+  python -m benchmarks.load --scale 0.01 --output after.json --compare before.json
+The statement counts are read from the Server-Timing header of the responses (see sql_timing.py).
+The page cache is disabled unless --page-cache is given, so the routes are measured when they render.
+DELETE /venues/<id> is not measured, it deletes the rows the other routes read.
+A request is an error if its status is 400 or more, or if it rolled back its database transaction:
+the routes catch their own errors and redirect with a flashed message.
+The results are written to benchmarks/benchmark-results.json unless --output is given.
+WARNING: the benchmark drops and recreates all the tables of its database (--database-url or
+BENCHMARK_DATABASE_URL, a sqlite file in the temporary directory by default), never point it to a database you need.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import platform
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import sqlalchemy
+from sqlalchemy import event
+from app import app, db, page_cache, encode_cursor, Venue, Artist, Show, VenueGenre, ArtistGenre
+from page_cache import LRUCacheBackend
+from benchmarks import setup_benchmark_db
+
+GENRES = ['Jazz', 'Rock n Roll', 'Folk', 'Blues', 'Soul', 'Pop', 'Punk', 'Classical']
+INSERT_CHUNK_SIZE = 10000
+SERVER_TIMING_STATEMENTS = re.compile(r'desc="(\d+) statements?"')
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark-results.json')
+
+# rollbacks of the sessions of the current thread, the test client handles a request in the thread that sends it
+rollbacks = threading.local()
+
+
+def count_rollback(session):
+  rollbacks.count = getattr(rollbacks, 'count', 0) + 1
+
+
+def insert_chunked(model, rows):
+  """ Inserts the rows yielded by rows with one executemany statement per chunk """
+  chunk = []
+  for row in rows:
+    chunk.append(row)
+    if len(chunk) == INSERT_CHUNK_SIZE:
+      db.session.execute(model.__table__.insert(), chunk)
+      chunk = []
+  if chunk:
+    db.session.execute(model.__table__.insert(), chunk)
+  db.session.commit()
+
+
+def seed(venues, artists, shows, rng):
+  """ Inserts venues venues in venues // 20 areas, artists artists and shows shows spread over two years around now,
+  every venue and artist has one or two genres """
+  insert_chunked(Venue, ({'id': i, 'name': f'Venue {i}', 'city': f'City {i % max(venues // 20, 1)}',
+    'state': f'S{i % 50}', 'address': f'{i} Main Street', 'image_link': f'https://example.com/venues/{i}.jpg'}
+    for i in range(1, venues + 1)))
+  insert_chunked(Artist, ({'id': i, 'name': f'Artist {i}', 'city': f'City {i % 500}', 'state': f'S{i % 50}',
+    'image_link': f'https://example.com/artists/{i}.jpg'} for i in range(1, artists + 1)))
+  insert_chunked(VenueGenre, ({'venue': i, 'genre': genre}
+    for i in range(1, venues + 1) for genre in GENRES[i % 7:i % 7 + 1 + i % 2]))
+  insert_chunked(ArtistGenre, ({'artist': i, 'genre': genre}
+    for i in range(1, artists + 1) for genre in GENRES[i % 7:i % 7 + 1 + i % 2]))
+
+  now = datetime.datetime.now()
+  insert_chunked(Show, ({'artist': rng.randint(1, artists), 'venue': rng.randint(1, venues),
+    'start_time': now + datetime.timedelta(minutes=rng.randint(-525600, 525600))} for _ in range(shows)))
+
+
+def build_routes(venues, artists, rng):
+  """ Returns (name, function(client) -> response) for every route """
+  def venue_id():
+    return rng.randint(1, venues)
+
+  def artist_id():
+    return rng.randint(1, artists)
+
+  # tokens of the page in the middle of the keyset paginated listings
+  middle_artist = db.session.query(Artist.name, Artist.id).order_by(Artist.name, Artist.id)\
+    .offset(artists // 2).first()
+  middle_show = db.session.query(Show.start_time, Show.id).order_by(Show.start_time, Show.id)\
+    .offset(db.session.query(Show).count() // 2).first()
+  artists_after = encode_cursor(list(middle_artist)) if middle_artist else None
+  shows_after = encode_cursor(list(middle_show)) if middle_show else None
+  db.session.remove()
+
+  def show_form():
+    return {'artist_id': artist_id(), 'venue_id': venue_id(), 'start_time': '2030-01-01 20:00:00'}
+
+  def venue_form(name):
+    return {'name': name, 'city': 'City 1', 'state': 'S1', 'address': '1 Main Street', 'phone': '555-0100',
+      'facebook_link': '', 'image_link': '', 'website': '', 'genres': ['Jazz'], 'seeking_description': ''}
+
+  def artist_form(name):
+    return {'name': name, 'city': 'City 1', 'state': 'S1', 'phone': '555-0100', 'facebook_link': '',
+      'image_link': '', 'website': '', 'genres': ['Folk'], 'seeking_description': ''}
+
+  return [
+    ('GET /', lambda client: client.get('/')),
+    ('GET /venues', lambda client: client.get('/venues')),
+    ('GET /venues?genre', lambda client: client.get('/venues', query_string={'genre': rng.choice(GENRES)})),
+    ('POST /venues/search', lambda client: client.post('/venues/search',
+      data={'search_term': f'Venue {rng.randint(1, 999)}'})),
+    ('GET /venues/<id>', lambda client: client.get(f'/venues/{venue_id()}')),
+    ('GET /venues/create', lambda client: client.get('/venues/create')),
+    ('POST /venues/create', lambda client: client.post('/venues/create',
+      data=venue_form(f'Load Venue {rng.random()}'))),
+    ('GET /venues/<id>/edit', lambda client: client.get(f'/venues/{venue_id()}/edit')),
+    ('POST /venues/<id>/edit', lambda client: client.post(f'/venues/{venue_id()}/edit',
+      data=venue_form(f'Venue {rng.random()}'))),
+    ('GET /artists', lambda client: client.get('/artists')),
+    ('GET /artists?after', lambda client: client.get('/artists', query_string={'after': artists_after})),
+    ('GET /artists?genre', lambda client: client.get('/artists', query_string={'genre': rng.choice(GENRES)})),
+    ('POST /artists/search', lambda client: client.post('/artists/search',
+      data={'search_term': f'Artist {rng.randint(1, 999)}'})),
+    ('GET /artists/<id>', lambda client: client.get(f'/artists/{artist_id()}')),
+    ('GET /artists/create', lambda client: client.get('/artists/create')),
+    ('POST /artists/create', lambda client: client.post('/artists/create',
+      data=artist_form(f'Load Artist {rng.random()}'))),
+    ('GET /artists/<id>/edit', lambda client: client.get(f'/artists/{artist_id()}/edit')),
+    ('POST /artists/<id>/edit', lambda client: client.post(f'/artists/{artist_id()}/edit',
+      data=artist_form(f'Artist {rng.random()}'))),
+    ('GET /shows', lambda client: client.get('/shows')),
+    ('GET /shows?after', lambda client: client.get('/shows', query_string={'after': shows_after})),
+    ('GET /shows/create', lambda client: client.get('/shows/create')),
+    ('POST /shows/create', lambda client: client.post('/shows/create', data=show_form())),
+    ('POST /shows/bulk', lambda client: client.post('/shows/bulk', json=[show_form() for _ in range(20)])),
+  ]
+
+
+def percentile(sorted_values, p):
+  """ Nearest-rank percentile of sorted_values """
+  if not sorted_values:
+    return None
+  rank = max(int(round(p / 100 * len(sorted_values))) - 1, 0)
+  return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def run_route(request, requests, concurrency):
+  """ Sends requests requests from concurrency threads, each with its own test client """
+  latencies = []
+  statements = []
+  errors = [0]
+  lock = threading.Lock()
+  clients = threading.local()
+
+  def send(_):
+    if not hasattr(clients, 'client'):
+      clients.client = app.test_client()
+    rollbacks.count = 0
+    started = time.perf_counter()
+    res = request(clients.client)
+    elapsed = time.perf_counter() - started
+    match = SERVER_TIMING_STATEMENTS.search(res.headers.get('Server-Timing', ''))
+    with lock:
+      latencies.append(elapsed)
+      if match:
+        statements.append(int(match.group(1)))
+      if res.status_code >= 400 or rollbacks.count:
+        errors[0] += 1
+
+  started = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=concurrency) as executor:
+    list(executor.map(send, range(requests)))
+  wall_seconds = time.perf_counter() - started
+
+  latencies.sort()
+  ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+  return {
+    'requests': requests,
+    'errors': errors[0],
+    'p50_ms': ms(percentile(latencies, 50)),
+    'p95_ms': ms(percentile(latencies, 95)),
+    'p99_ms': ms(percentile(latencies, 99)),
+    'mean_ms': ms(sum(latencies) / len(latencies)),
+    'max_ms': ms(latencies[-1]),
+    'throughput_rps': round(requests / wall_seconds, 1),
+    'statements_mean': round(sum(statements) / len(statements), 2) if statements else None,
+    'statements_max': max(statements) if statements else None,
+  }
+
+
+def compare(results, baseline, tolerance):
+  """ Returns the routes whose p95 latency or statement count grew by more than tolerance since baseline """
+  regressions = []
+  for name, result in results['routes'].items():
+    before = baseline.get('routes', {}).get(name)
+    if not before:
+      continue
+    for metric in ['p95_ms', 'statements_max']:
+      if before.get(metric) and result.get(metric) is not None and result[metric] > before[metric] * (1 + tolerance):
+        regressions.append(f'{name}: {metric} {before[metric]} -> {result[metric]}')
+  return regressions
+
+
+def parse_args(argv):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--venues', type=int, default=10000)
+  parser.add_argument('--artists', type=int, default=50000)
+  parser.add_argument('--shows', type=int, default=1000000)
+  parser.add_argument('--scale', type=float, default=1.0, help='multiplies the dataset sizes, e.g. 0.01 for a quick run')
+  parser.add_argument('--requests', type=int, default=200, help='requests per route')
+  parser.add_argument('--concurrency', type=int, default=8)
+  parser.add_argument('--routes', help='only run the routes whose name contains this text')
+  parser.add_argument('--page-cache', action='store_true', help='keep the page cache enabled')
+  parser.add_argument('--database-url', default=os.getenv('BENCHMARK_DATABASE_URL'),
+    help='defaults to BENCHMARK_DATABASE_URL or a sqlite file in the temporary directory')
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--output', default=DEFAULT_OUTPUT)
+  parser.add_argument('--compare', help='a previous output file, exits with 1 if a route regressed')
+  parser.add_argument('--tolerance', type=float, default=0.2, help='allowed growth before a regression (0.2 = 20%%)')
+  return parser.parse_args(argv)
+
+
+def main(argv=None):
+  args = parse_args(argv)
+  rng = random.Random(args.seed)
+  venues, artists, shows = (max(int(count * args.scale), 1) for count in (args.venues, args.artists, args.shows))
+  # an in-memory sqlite database is a single connection, the concurrent clients need a file
+  url = args.database_url or 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur_load_benchmark.db')
+
+  # drops all the tables of url
+  setup_benchmark_db(app, db, url)
+  event.listen(db.session, 'after_rollback', count_rollback)
+  app.config['WTF_CSRF_ENABLED'] = False
+  # slow statements are expected with a large dataset, they are reported below rather than logged
+  app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+  if not args.page_cache:
+    # every page is evicted as soon as it is stored
+    page_cache.backend = LRUCacheBackend(max_size=0)
+
+  with app.app_context():
+    started = time.perf_counter()
+    seed(venues, artists, shows, rng)
+    seed_seconds = time.perf_counter() - started
+    print(f'seeded {venues} venues, {artists} artists and {shows} shows in {seed_seconds:.1f}s')
+    routes = build_routes(venues, artists, rng)
+    dialect = db.engine.dialect.name
+
+  results = {
+    'meta': {
+      'date': datetime.datetime.now().isoformat(timespec='seconds'),
+      'venues': venues, 'artists': artists, 'shows': shows,
+      'requests_per_route': args.requests, 'concurrency': args.concurrency, 'page_cache': args.page_cache,
+      'database': dialect, 'python': platform.python_version(), 'sqlalchemy': sqlalchemy.__version__,
+    },
+    'routes': {}
+  }
+
+  print(f'{"route":<26} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"req/s":>8} {"stmts":>6} {"errors":>7}')
+  for name, request in routes:
+    if args.routes and args.routes not in name:
+      continue
+    result = run_route(request, args.requests, args.concurrency)
+    results['routes'][name] = result
+    print(f'{name:<26} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f} '
+      f'{result["throughput_rps"]:>8.1f} {result["statements_max"] or 0:>6} {result["errors"]:>7}')
+
+  with open(args.output, 'w') as output:
+    json.dump(results, output, indent=2)
+  print(f'results written to {args.output}')
+
+  if args.compare:
+    with open(args.compare) as baseline:
+      regressions = compare(results, json.load(baseline), args.tolerance)
+    for regression in regressions:
+      print('REGRESSION', regression)
+    if regressions:
+      sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,56 @@
+""" Measures GET /venues while the number of areas grows,
+the number of sql statements per request should stay the same for every area count.
+  python -m benchmarks.venues"""
+import time
+import datetime
+from app import app, db, page_cache, Venue, Show, Artist
+from benchmarks import setup_benchmark_db, count_statements
+from page_cache import LRUCacheBackend
+
+AREA_COUNTS = [10, 100, 1000, 4000]
+VENUES_PER_AREA = 3
+SHOWS_PER_VENUE = 2
+
+
+def seed(area_count):
+  Show.query.delete()
+  Venue.query.delete()
+  Artist.query.delete()
+  artist = Artist(name='Benchmark Artist')
+  db.session.add(artist)
+  db.session.flush()
+
+  venues = []
+  for area in range(area_count):
+    for v in range(VENUES_PER_AREA):
+      venues.append({'name': f'Venue {area}-{v}', 'city': f'City {area}', 'state': f'S{area % 50}'})
+  db.session.bulk_insert_mappings(Venue, venues)
+
+  start_time = datetime.datetime.now() + datetime.timedelta(days=30)
+  venue_ids = [venue_id for venue_id, in db.session.query(Venue.id)]
+  shows = [{'artist_id': artist.id, 'venue_id': venue_id, 'start_time': start_time}
+    for venue_id in venue_ids for _ in range(SHOWS_PER_VENUE)]
+  db.session.bulk_insert_mappings(Show, shows)
+  db.session.commit()
+
+
+def main():
+  setup_benchmark_db(app, db)
+  # the page is rendered by every request, a cached page would be measured instead of the query
+  page_cache.backend = LRUCacheBackend(max_size=0)
+  client = app.test_client()
+  print(f"{'areas':>8} {'venues':>8} {'statements':>11} {'seconds':>9}")
+  with app.app_context():
+    for area_count in AREA_COUNTS:
+      seed(area_count)
+      db.session.remove()
+      with count_statements(db.engine) as statements:
+        start = time.perf_counter()
+        res = client.get('/venues')
+        elapsed = time.perf_counter() - start
+      assert res.status_code == 200
+      print(f'{area_count:>8} {area_count * VENUES_PER_AREA:>8} {statements[0]:>11} {elapsed:>9.3f}')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,36 @@
+"""convert Show.start_time to a timestamp and index it per venue and artist
+
+Revision ID: 4f0c2d9a7b13
+Revises: 56110b706474
+Create Date: 2026-10-18 11:03:27.540915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f0c2d9a7b13'
+down_revision = '56110b706474'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column('Show', 'start_time',
+               existing_type=sa.String(),
+               type_=sa.DateTime(),
+               existing_nullable=True,
+               postgresql_using='start_time::timestamp without time zone')
+    op.create_index('ix_Show_venue_start_time', 'Show', ['venue', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_start_time', 'Show', ['artist', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Show_artist_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_start_time', table_name='Show')
+    op.alter_column('Show', 'start_time',
+               existing_type=sa.DateTime(),
+               type_=sa.String(),
+               existing_nullable=True,
+               postgresql_using="to_char(start_time, 'YYYY-MM-DD HH24:MI:SS')")
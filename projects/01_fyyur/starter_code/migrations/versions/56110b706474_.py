@@ -0,0 +1,30 @@
+"""add trigram indexes on venue and artist names
+
+Revision ID: 56110b706474
+Revises: 75f0ff70706d
+Create Date: 2026-10-18 10:12:41.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '56110b706474'
+down_revision = '75f0ff70706d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the trigram operator class makes ILIKE '%term%' searches use the index instead of a sequential scan
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], unique=False,
+               postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], unique=False,
+               postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_Venue_name_trgm', table_name='Venue')
@@ -0,0 +1,26 @@
+"""add keyset pagination indexes on Show(start_time, id) and Artist(name, id)
+
+Revision ID: b83e51f0c6d2
+Revises: 4f0c2d9a7b13
+Create Date: 2026-10-18 12:21:05.671284
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b83e51f0c6d2'
+down_revision = '4f0c2d9a7b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+    op.create_index('ix_Artist_name_id', 'Artist', ['name', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name_id', table_name='Artist')
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
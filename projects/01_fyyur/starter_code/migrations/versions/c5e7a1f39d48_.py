@@ -0,0 +1,27 @@
+"""add index on Venue(state, city, id) for the venues by area page
+
+The Show.artist and Show.venue foreign keys are already the leading columns
+of ix_Show_artist_start_time and ix_Show_venue_start_time, so they do not need indexes of their own.
+
+Revision ID: c5e7a1f39d48
+Revises: b83e51f0c6d2
+Create Date: 2026-10-18 14:02:37.118420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e7a1f39d48'
+down_revision = 'b83e51f0c6d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Venue_state_city_id', 'Venue', ['state', 'city', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_state_city_id', table_name='Venue')
@@ -0,0 +1,67 @@
+"""move Venue.genres and Artist.genres into indexed genre tables
+
+The comma separated genres strings (with or without the surrounding braces)
+are split into one VenueGenre/ArtistGenre row per genre, then the string columns are dropped.
+
+Revision ID: e8d41b0c27f5
+Revises: c5e7a1f39d48
+Create Date: 2026-10-18 15:11:52.304716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8d41b0c27f5'
+down_revision = 'c5e7a1f39d48'
+branch_labels = None
+depends_on = None
+
+# (owner table, genre table, owner column of the genre table)
+GENRE_TABLES = [('Venue', 'VenueGenre', 'venue'), ('Artist', 'ArtistGenre', 'artist')]
+
+
+def split_genres(genres):
+    genres = (genres or '').strip().lstrip('{').rstrip('}')
+    names = []
+    for genre in genres.split(','):
+        # truncated to the column length before the duplicates are removed,
+        # two long genres with the same first 50 characters would be the same primary key
+        genre = genre.strip().strip('"').strip()[:50]
+        if genre and genre not in names:
+            names.append(genre)
+    return names
+
+
+def upgrade():
+    connection = op.get_bind()
+    for owner, genre_table, owner_column in GENRE_TABLES:
+        table = op.create_table(genre_table,
+            sa.Column(owner_column, sa.Integer(), nullable=False),
+            sa.Column('genre', sa.String(length=50), nullable=False),
+            sa.ForeignKeyConstraint([owner_column], [owner + '.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint(owner_column, 'genre')
+        )
+        rows = []
+        for id, genres in connection.execute(sa.text('SELECT id, genres FROM "{}"'.format(owner))):
+            rows.extend({owner_column: id, 'genre': genre} for genre in split_genres(genres))
+        if rows:
+            op.bulk_insert(table, rows)
+        op.create_index('ix_{}_genre_{}'.format(genre_table, owner_column), genre_table, ['genre', owner_column], unique=False)
+        op.drop_column(owner, 'genres')
+
+
+def downgrade():
+    connection = op.get_bind()
+    for owner, genre_table, owner_column in GENRE_TABLES:
+        op.add_column(owner, sa.Column('genres', sa.String(length=120), nullable=True))
+        genres = {}
+        for id, genre in connection.execute(sa.text(
+                'SELECT "{0}", genre FROM "{1}" ORDER BY "{0}", genre'.format(owner_column, genre_table))):
+            genres.setdefault(id, []).append(genre)
+        for id, names in genres.items():
+            connection.execute(sa.text('UPDATE "{}" SET genres = :genres WHERE id = :id'.format(owner)),
+                genres='{' + ','.join(names) + '}', id=id)
+        op.drop_index('ix_{}_genre_{}'.format(genre_table, owner_column), table_name=genre_table)
+        op.drop_table(genre_table)
@@ -0,0 +1,115 @@
+""" A cache for rendered pages.
+
+Every page is stored under a key made of its url and the current versions of the data it shows
+(e.g. the version of venue 3 and the version of all the shows), the controllers that create, edit or delete
+rows bump those versions, so a changed page gets a new key and the stale copy is never read again.
+
+The backend is anything with the get/mget/set/incr/delete methods of a redis client,
+LRUCacheBackend keeps the pages in memory, a redis.Redis client can be used as is to share them between processes.
+"""
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCacheBackend:
+    """ An in-memory backend that keeps the max_size most recently used keys, it follows the redis client api """
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        # the counters of incr are never evicted, an evicted version would restart from 0
+        # and could match a page cached before it was bumped
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name):
+        if name in self._counters:
+            return self._counters[name]
+        item = self._items.get(name)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._items[name]
+            return None
+        self._items.move_to_end(name)
+        return value
+
+    def get(self, name):
+        with self._lock:
+            return self._get(name)
+
+    def mget(self, keys):
+        with self._lock:
+            return [self._get(name) for name in keys]
+
+    def set(self, name, value, ex=None):
+        with self._lock:
+            self._counters.pop(name, None)
+            self._items[name] = (value, time.monotonic() + ex if ex else None)
+            self._items.move_to_end(name)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return True
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            value = int(self._get(name) or 0) + amount
+            self._items.pop(name, None)
+            self._counters[name] = value
+            return value
+
+    def delete(self, *names):
+        with self._lock:
+            deleted = 0
+            for name in names:
+                if self._items.pop(name, None) is not None or self._counters.pop(name, None) is not None:
+                    deleted += 1
+            return deleted
+
+
+class PageCache:
+    """ Stores rendered pages in backend, pages expire after timeout seconds (None to keep them until evicted) """
+
+    def __init__(self, backend, prefix='fyyur', timeout=None):
+        self.backend = backend
+        self.prefix = prefix
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+    def version_key(self, name):
+        return f'{self.prefix}:version:{name}'
+
+    def versions(self, names):
+        """ Returns the current versions of the data names, e.g. ['venue:3', 'shows'] """
+        return [int(value or 0) for value in self.backend.mget([self.version_key(name) for name in names])]
+
+    def invalidate(self, *names):
+        """ Bumps the versions of the data names, every page showing them is rendered again """
+        for name in names:
+            self.backend.incr(self.version_key(name))
+
+    def get_or_render(self, url, dependencies, render):
+        """ Returns the cached page of url for the current versions of dependencies,
+        or renders it by calling render and caches it """
+        versions = ','.join(f'{name}={version}' for name, version in zip(dependencies, self.versions(dependencies)))
+        key = f'{self.prefix}:page:{url}:{versions}'
+        page = self.backend.get(key)
+        if page is not None:
+            self.hits += 1
+            return page.decode() if isinstance(page, bytes) else page
+
+        self.misses += 1
+        page = render()
+        self.backend.set(key, page.encode(), ex=self.timeout)
+        return page
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
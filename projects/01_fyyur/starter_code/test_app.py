@@ -0,0 +1,391 @@
+import os
+import re
+import base64
+import json
+import unittest
+import datetime
+import urllib.parse
+import importlib.util
+from sqlalchemy import event
+
+import babel.dates
+from page_cache import LRUCacheBackend
+from app import app, db, page_cache, Venue, Artist, Show, VenueGenre, MAX_PAGE_SIZE, DATETIME_FORMATS, format_datetime, format_cached_datetime, search_by_name
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Point the app to the test database before it is used for the first time."""
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        app.config['WTF_CSRF_ENABLED'] = False
+
+    def setUp(self):
+        """Define test variables and create the tables."""
+        self.client = app.test_client
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.statements = []
+        # every test starts with an empty page cache, the ids of the rows are reused between tests
+        page_cache.backend = LRUCacheBackend()
+        event.listen(db.engine, 'before_cursor_execute', self.record_statement)
+
+    def tearDown(self):
+        """Executed after reach test"""
+        event.remove(db.engine, 'before_cursor_execute', self.record_statement)
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def record_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def create_venue_with_shows(self, shows_count):
+        '''
+        Creates a venue with shows_count shows, each show has its own artist,
+        half of the shows are past shows and the other half are upcoming.
+        '''
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+        artists = [Artist(name=f'Artist {i}', image_link=f'https://example.com/{i}.jpg') for i in range(shows_count)]
+        db.session.add(venue)
+        db.session.add_all(artists)
+        db.session.flush()
+        now = datetime.datetime.now()
+        for i, artist in enumerate(artists):
+            start_time = now + datetime.timedelta(days=i - shows_count // 2, hours=1)
+            db.session.add(Show(artist_id=artist.id, venue_id=venue.id, start_time=start_time))
+        db.session.commit()
+        venue_id = venue.id
+        db.session.remove()
+        return venue_id
+
+    def count_statements(self, url):
+        self.statements.clear()
+        res = self.client().get(url)
+        self.assertEqual(res.status_code, 200)
+        return len(self.statements), res
+
+    def test_show_venue_statement_count_is_bounded(self):
+        '''
+        The artists of the shows are eager loaded with the shows,
+        so the number of statements does not depend on the number of shows.
+        '''
+        few_shows_venue_id = self.create_venue_with_shows(5)
+        many_shows_venue_id = self.create_venue_with_shows(500)
+
+        few_count, _ = self.count_statements(f'/venues/{few_shows_venue_id}')
+        many_count, res = self.count_statements(f'/venues/{many_shows_venue_id}')
+
+        self.assertEqual(few_count, many_count)
+        self.assertLessEqual(many_count, 4)
+        self.assertIn(b'Artist 499', res.data)
+        self.assertIn(b'250 Upcoming Shows', res.data)
+
+    def test_show_artist_statement_count_is_bounded(self):
+        venue_id = self.create_venue_with_shows(3)
+        artist = Artist(name='Touring Artist', genres=['Rock', 'Folk'])
+        db.session.add(artist)
+        db.session.flush()
+        now = datetime.datetime.now()
+        for i in range(200):
+            db.session.add(Show(artist_id=artist.id, venue_id=venue_id, start_time=now + datetime.timedelta(days=i + 1)))
+        db.session.commit()
+        artist_id = artist.id
+        db.session.remove()
+
+        count, res = self.count_statements(f'/artists/{artist_id}')
+
+        self.assertLessEqual(count, 4)
+        self.assertIn(b'200 Upcoming Shows', res.data)
+        self.assertIn(b'The Musical Hop', res.data)
+
+    def test_shows_statement_count_is_bounded(self):
+        self.create_venue_with_shows(100)
+
+        count, res = self.count_statements('/shows?per_page=100')
+
+        # the shows, then on the last page the shows without a start time, listed after the others
+        self.assertEqual(count, 2)
+        self.assertIn(b'Artist 99', res.data)
+
+    def get_all_pages(self, url, per_page):
+        '''
+        Follows the next page tokens from the first page to the last one,
+        it returns the pages in order.
+        '''
+        pages = []
+        token = None
+        while True:
+            params = {'per_page': per_page}
+            if token:
+                params['after'] = token
+            res = self.client().get(url, query_string=params)
+            self.assertEqual(res.status_code, 200)
+            pages.append(res.data)
+            token = self.extract_next_token(res.data)
+            if token is None:
+                return pages
+
+    def extract_next_token(self, html):
+        marker = b'after='
+        start = html.find(marker)
+        if start == -1:
+            return None
+        end = html.find(b'&', start)
+        return urllib.parse.unquote(html[start + len(marker):end].decode())
+
+    def test_artists_keyset_pagination(self):
+        names = [f'Artist {i:03}' for i in range(25)]
+        db.session.add_all([Artist(name=name) for name in reversed(names)])
+        db.session.commit()
+        db.session.remove()
+
+        pages = self.get_all_pages('/artists', per_page=10)
+
+        self.assertEqual(len(pages), 3)
+        for i, name in enumerate(names):
+            self.assertIn(name.encode(), pages[i // 10])
+        self.assertNotIn(b'Next page', pages[-1])
+
+    def test_artists_keyset_pagination_with_null_names(self):
+        '''
+        Artists without a name are listed after the named artists,
+        no artist is skipped or repeated between pages whichever side of a page boundary they are on.
+        '''
+        artists = [Artist(name=None if i % 2 else f'Artist {i:03}') for i in range(13)]
+        db.session.add_all(artists)
+        db.session.commit()
+        named = [a.id for a in sorted(artists, key=lambda a: (a.name is None, a.name or '', a.id)) if a.name]
+        unnamed = sorted(a.id for a in artists if a.name is None)
+        db.session.remove()
+
+        pages = self.get_all_pages('/artists', per_page=5)
+
+        ids = [int(i) for page in pages for i in re.findall(rb'href="/artists/(\d+)"', page)]
+        self.assertEqual(ids, named + unnamed)
+
+    def test_shows_keyset_pagination_with_equal_start_times(self):
+        '''
+        Shows starting at the same time are ordered by id,
+        so no show is skipped or repeated between pages.
+        '''
+        self.create_venue_with_shows(12)
+        start_time = datetime.datetime(2030, 1, 1, 20, 0)
+        Show.query.update({'start_time': start_time})
+        db.session.commit()
+
+        pages = self.get_all_pages('/shows', per_page=5)
+
+        self.assertEqual(len(pages), 3)
+        found = [sum(page.count(f'>Artist {i}<'.encode()) for page in pages) for i in range(12)]
+        self.assertEqual(found, [1] * 12)
+
+    def test_shows_keyset_pagination_with_null_start_times(self):
+        self.create_venue_with_shows(7)
+        Show.query.filter(Show.id % 3 == 0).update({'start_time': None}, synchronize_session=False)
+        db.session.commit()
+
+        pages = self.get_all_pages('/shows', per_page=2)
+
+        self.assertEqual(len(pages), 4)
+        found = [sum(page.count(f'>Artist {i}<'.encode()) for page in pages) for i in range(7)]
+        self.assertEqual(found, [1] * 7)
+
+    def test_shows_page_size_is_limited(self):
+        self.create_venue_with_shows(120)
+
+        res = self.client().get('/shows', query_string={'per_page': 1000})
+
+        self.assertEqual(res.data.count(b'tile-show'), MAX_PAGE_SIZE)
+
+    def test_shows_malformed_token(self):
+        res = self.client().get('/shows', query_string={'after': 'not-a-token'})
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_forged_tokens_are_rejected(self):
+        '''
+        Tokens that decode to json of the wrong shape or with values of the wrong types
+        are rejected before they reach the query.
+        '''
+        forged = {
+            '/shows': ['"ab"', '{"a": 1}', '[{"a": 1}, 1]', '[5, 1]', '["2030-01-01T20:00:00", "1"]',
+                '["2030-01-01T20:00:00", true]', '["2030-01-01T20:00:00", 1.5]'],
+            '/artists': ['"ab"', '[["Artist"], 1]', '[1, 1]', '["Artist", {"id": 1}]'],
+        }
+        for url, tokens in forged.items():
+            for token in tokens:
+                with self.subTest(url=url, token=token):
+                    after = base64.urlsafe_b64encode(token.encode()).decode()
+                    res = self.client().get(url, query_string={'after': after})
+                    self.assertEqual(res.status_code, 400)
+
+    def test_bulk_shows_json(self):
+        venue_id = self.create_venue_with_shows(1)
+        artist_id = Artist.query.first().id
+        db.session.remove()
+        rows = [
+            {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': f'2030-01-{day:02d} 20:00:00'}
+            for day in range(1, 21)
+        ]
+        rows.append({'artist_id': artist_id, 'venue_id': venue_id + 100, 'start_time': '2030-02-01 20:00:00'})
+        rows.append({'artist_id': artist_id, 'venue_id': venue_id, 'start_time': 'not a date'})
+
+        self.statements.clear()
+        res = self.client().post('/shows/bulk', json={'shows': rows})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(data['success'])
+        self.assertEqual(data['created'], 20)
+        self.assertEqual(data['rejected'], 2)
+        self.assertEqual(data['results'][20], {'row': 21, 'status': 'rejected', 'error': f'unknown venue {venue_id + 100}'})
+        self.assertEqual(data['results'][21]['status'], 'rejected')
+        # the id lookup and the executemany insert, whatever the number of rows
+        self.assertEqual(len(self.statements), 2)
+        self.assertEqual(Show.query.count(), 21)
+
+    def test_bulk_shows_csv(self):
+        venue_id = self.create_venue_with_shows(1)
+        artist_id = Artist.query.first().id
+        db.session.remove()
+        body = 'artist_id,venue_id,start_time\n' + ''.join(
+            f'{artist_id},{venue_id},2030-03-{day:02d}T21:00:00\n' for day in range(1, 11))
+
+        res = self.client().post('/shows/bulk', data=body, content_type='text/csv')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['success'])
+        self.assertEqual(data['created'], 10)
+        self.assertEqual(Show.query.filter_by(artist_id=artist_id).count(), 11)
+
+    def test_bulk_shows_malformed_body(self):
+        res = self.client().post('/shows/bulk', data='not json', content_type='application/json')
+
+        self.assertEqual(res.status_code, 400)
+
+    def search(self, url, search_term):
+        '''
+        Posts the search form, returns the count and the names of the results in the order of the page.
+        '''
+        self.statements.clear()
+        res = self.client().post(url, data={'search_term': search_term})
+        self.assertEqual(res.status_code, 200)
+        html = res.data.decode()
+        count = int(re.search(r'Number of search results for ".*": (\d+)<', html).group(1))
+        return count, re.findall(r'<h5>(.*?)</h5>', html)
+
+    def test_search_venues_ranking(self):
+        '''
+        The search is a case-insensitive partial match, the venues whose name contains the term
+        earliest come first, then the shortest names.
+        '''
+        for name in ['Park Square Live Music and Coffee', 'The Musical Hop', 'Rock Bar', 'Music Box', 'Hop Music']:
+            db.session.add(Venue(name=name, city='San Francisco', state='CA'))
+        db.session.commit()
+        db.session.remove()
+
+        count, names = self.search('/venues/search', 'mUSic')
+
+        self.assertEqual(count, 4)
+        self.assertEqual(names, ['Music Box', 'Hop Music', 'The Musical Hop', 'Park Square Live Music and Coffee'])
+        # the results and their count come from a single query
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(self.search('/venues/search', 'HOP'), (2, ['Hop Music', 'The Musical Hop']))
+        self.assertEqual(self.search('/venues/search', 'jazz'), (0, []))
+
+    def test_search_artists_ranking(self):
+        for name in ['Guns N Petals', 'Matt Quevedo', 'The Wild Sax Band', 'Band of Horses']:
+            db.session.add(Artist(name=name))
+        db.session.commit()
+        db.session.remove()
+
+        self.assertEqual(self.search('/artists/search', 'band'), (2, ['Band of Horses', 'The Wild Sax Band']))
+        # "a" is the second letter of Matt Quevedo and Band of Horses, the shorter name comes first
+        self.assertEqual(self.search('/artists/search', 'A'),
+            (4, ['Matt Quevedo', 'Band of Horses', 'Guns N Petals', 'The Wild Sax Band']))
+
+    def test_search_count_is_not_limited(self):
+        db.session.add_all([Artist(name=f'Band {i:02}') for i in range(12)])
+        db.session.commit()
+
+        artists, count = search_by_name(Artist, 'band', limit=5)
+
+        self.assertEqual(count, 12)
+        self.assertEqual([artist.name for artist in artists], [f'Band {i:02}' for i in range(5)])
+
+    def test_genres_are_listed_and_filtered(self):
+        venue_id = self.create_venue_with_shows(1)
+        db.session.add(Venue(name='Rock Bar', city='San Francisco', state='CA', genres=['Rock n Roll']))
+        db.session.add(Artist(name='Folk Singer', genres=['Folk']))
+        db.session.commit()
+        db.session.remove()
+
+        res = self.client().get(f'/venues/{venue_id}')
+        self.assertIn(b'<span class="genre">Jazz</span>', res.data)
+
+        res = self.client().get('/venues', query_string={'genre': 'Jazz'})
+        self.assertIn(b'The Musical Hop', res.data)
+        self.assertNotIn(b'Rock Bar', res.data)
+
+        res = self.client().get('/artists', query_string={'genre': 'Folk'})
+        self.assertIn(b'Folk Singer', res.data)
+        self.assertNotIn(b'Artist 0', res.data)
+
+    def test_migration_splits_genres_into_unique_rows(self):
+        spec = importlib.util.spec_from_file_location('split_genres_migration',
+            os.path.join(os.path.dirname(__file__), 'migrations', 'versions', 'e8d41b0c27f5_.py'))
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+        long_genre = 'Progressive ' * 5
+
+        genres = migration.split_genres('{Jazz,"Rock n Roll",Jazz,%sRock,%sMetal}' % (long_genre, long_genre))
+
+        # the genres of a row are the primary key of its genre rows once truncated to the column length
+        self.assertEqual(genres, ['Jazz', 'Rock n Roll', long_genre[:50]])
+
+    def test_editing_genres_replaces_rows(self):
+        venue_id = self.create_venue_with_shows(1)
+        venue = Venue.query.get(venue_id)
+        venue.genres = ['Jazz', 'Blues']
+        db.session.commit()
+        venue.genres = ['Blues', 'Folk']
+        db.session.commit()
+
+        self.assertEqual(sorted(row.genre for row in VenueGenre.query.filter_by(venue_id=venue_id)), ['Blues', 'Folk'])
+
+    def test_server_timing_header(self):
+        venue_id = self.create_venue_with_shows(4)
+
+        count, res = self.count_statements(f'/venues/{venue_id}')
+
+        self.assertRegex(res.headers['Server-Timing'], rf'^db;dur=[0-9.]+;desc="{count} statements"$')
+
+    def test_slow_queries_are_logged(self):
+        threshold = app.config['SLOW_QUERY_THRESHOLD_MS']
+        app.config['SLOW_QUERY_THRESHOLD_MS'] = 0
+        try:
+            with self.assertLogs('sql_timing', level='WARNING') as logs:
+                self.client().get('/shows')
+        finally:
+            app.config['SLOW_QUERY_THRESHOLD_MS'] = threshold
+        self.assertIn('GET /shows [shows]', logs.output[0])
+
+    def test_format_datetime_matches_babel(self):
+        format_cached_datetime.cache_clear()
+        date = datetime.datetime(2030, 1, 2, 15, 4)
+        for format in ['full', 'medium', 'y-MM-dd HH:mm']:
+            expected = babel.dates.format_datetime(date, DATETIME_FORMATS.get(format, format), locale='en')
+            self.assertEqual(format_datetime(date, format), expected)
+            self.assertEqual(format_datetime(date.isoformat(), format), expected)
+        self.assertEqual(format_cached_datetime.cache_info().hits, 3)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
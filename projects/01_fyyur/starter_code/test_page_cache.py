@@ -0,0 +1,199 @@
+import os
+import time
+import unittest
+import datetime
+from sqlalchemy import event
+
+from page_cache import PageCache, LRUCacheBackend
+from app import app, db, page_cache, Venue, Artist, Show
+
+
+class FakeRedis:
+    '''
+    A local stand-in for a redis.Redis client with the commands used by PageCache,
+    like redis it stores bytes and returns bytes.
+    '''
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+
+    def _get(self, name):
+        value, expires_at = self.data.get(name, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[name]
+            return None
+        return value
+
+    def get(self, name):
+        self.commands.append('GET')
+        return self._get(name)
+
+    def mget(self, keys):
+        self.commands.append('MGET')
+        return [self._get(name) for name in keys]
+
+    def set(self, name, value, ex=None):
+        self.commands.append('SET')
+        if isinstance(value, str):
+            value = value.encode()
+        self.data[name] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def incr(self, name, amount=1):
+        self.commands.append('INCR')
+        value = int(self._get(name) or 0) + amount
+        self.data[name] = (str(value).encode(), None)
+        return value
+
+    def delete(self, *names):
+        self.commands.append('DEL')
+        return sum(self.data.pop(name, None) is not None for name in names)
+
+
+class LRUCacheBackendTestCase(unittest.TestCase):
+    """This class represents the in-memory page cache backend test case"""
+
+    def test_least_recently_used_is_evicted(self):
+        backend = LRUCacheBackend(max_size=2)
+        backend.set('a', b'1')
+        backend.set('b', b'2')
+        backend.get('a')
+        backend.set('c', b'3')
+        self.assertEqual(backend.mget(['a', 'b', 'c']), [b'1', None, b'3'])
+
+    def test_counters_are_not_evicted(self):
+        backend = LRUCacheBackend(max_size=1)
+        backend.incr('version')
+        backend.set('a', b'1')
+        backend.set('b', b'2')
+        self.assertEqual(backend.incr('version'), 2)
+
+    def test_expired_keys_are_dropped(self):
+        backend = LRUCacheBackend()
+        backend.set('a', b'1', ex=0.1)
+        self.assertEqual(backend.get('a'), b'1')
+        time.sleep(0.15)
+        self.assertIsNone(backend.get('a'))
+
+
+class PageCacheTestCase(unittest.TestCase):
+    """This class represents the page cache test case, it runs against the redis fake"""
+
+    def setUp(self):
+        self.cache = PageCache(FakeRedis())
+        self.renders = []
+
+    def render(self):
+        self.renders.append(1)
+        return f'<h1>render {len(self.renders)}</h1>'
+
+    def test_page_is_rendered_once(self):
+        for _ in range(3):
+            page = self.cache.get_or_render('/venues/1', ['venue:1', 'shows'], self.render)
+        self.assertEqual(page, '<h1>render 1</h1>')
+        self.assertEqual(len(self.renders), 1)
+        self.assertEqual(self.cache.stats()['hits'], 2)
+        # one round trip for the versions and one for the page
+        self.assertEqual(self.cache.backend.commands[-2:], ['MGET', 'GET'])
+
+    def test_invalidate_renders_dependent_pages_again(self):
+        self.cache.get_or_render('/venues/1', ['venue:1', 'shows'], self.render)
+        self.cache.get_or_render('/venues/2', ['venue:2', 'shows'], self.render)
+
+        self.cache.invalidate('venue:1')
+        self.assertEqual(self.cache.get_or_render('/venues/1', ['venue:1', 'shows'], self.render), '<h1>render 3</h1>')
+        self.assertEqual(self.cache.get_or_render('/venues/2', ['venue:2', 'shows'], self.render), '<h1>render 2</h1>')
+
+        self.cache.invalidate('shows')
+        self.cache.get_or_render('/venues/2', ['venue:2', 'shows'], self.render)
+        self.assertEqual(len(self.renders), 4)
+
+
+class CachedPagesTestCase(unittest.TestCase):
+    """This class represents the cached fyyur pages test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        app.config['WTF_CSRF_ENABLED'] = False
+
+    def setUp(self):
+        self.client = app.test_client
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.original_backend = page_cache.backend
+        page_cache.backend = FakeRedis()
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.record_statement)
+
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+        artist = Artist(name='Guns N Petals', genres=['Rock n Roll'])
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        db.session.add(Show(artist_id=artist.id, venue_id=venue.id,
+            start_time=datetime.datetime.now() + datetime.timedelta(days=1)))
+        db.session.commit()
+        self.venue_id, self.artist_id = venue.id, artist.id
+        db.session.remove()
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.record_statement)
+        page_cache.backend = self.original_backend
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def record_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def get(self, url):
+        self.statements.clear()
+        res = self.client().get(url)
+        self.assertEqual(res.status_code, 200)
+        return res
+
+    def test_cached_pages_issue_no_statements(self):
+        for url in ['/venues', f'/venues/{self.venue_id}', f'/artists/{self.artist_id}', '/shows']:
+            first = self.get(url)
+            self.assertTrue(self.statements)
+            second = self.get(url)
+            self.assertEqual(self.statements, [])
+            self.assertEqual(first.data, second.data)
+
+    def test_new_show_invalidates_pages(self):
+        self.get(f'/venues/{self.venue_id}')
+        self.get('/shows')
+
+        res = self.client().post('/shows/bulk', json=[
+            {'artist_id': self.artist_id, 'venue_id': self.venue_id, 'start_time': '2030-01-01 20:00:00'}
+        ])
+        self.assertEqual(res.status_code, 200)
+
+        self.assertIn(b'2 Upcoming Shows', self.get(f'/venues/{self.venue_id}').data)
+        self.assertEqual(self.get('/shows').data.count(b'tile-show'), 2)
+
+    def test_new_venue_invalidates_venues_page(self):
+        self.get('/venues')
+        self.client().post('/venues/create', data={
+            'name': 'Park Square Live Music', 'city': 'New York', 'state': 'NY', 'address': '34 Whiskey Moore Ave',
+            'phone': '', 'facebook_link': '', 'image_link': '', 'website': '', 'genres': ['Jazz'],
+            'seeking_description': ''
+        })
+
+        self.assertIn(b'Park Square Live Music', self.get('/venues').data)
+
+    def test_pages_with_flashed_messages_are_not_cached(self):
+        with self.client() as client:
+            with client.session_transaction() as session:
+                session['_flashes'] = [('message', 'Cannot edit, artist does not exist')]
+            res = client.get(f'/artists/{self.artist_id}')
+            self.assertIn(b'Cannot edit', res.data)
+
+        self.assertNotIn(b'Cannot edit', self.get(f'/artists/{self.artist_id}').data)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import os
+import re
+import unittest
+import datetime
+from sqlalchemy import event
+
+from page_cache import LRUCacheBackend
+from app import app, db, page_cache, Venue, Artist, Show, VenueGenre, ArtistGenre
+
+
+VENUES_COUNT = 200
+ARTISTS_COUNT = 200
+SHOWS_COUNT = 2000
+GENRES = ['Jazz', 'Rock n Roll', 'Folk', 'Blues', 'Soul']
+
+TABLES = {Venue.__tablename__, Artist.__tablename__, Show.__tablename__,
+    VenueGenre.__tablename__, ArtistGenre.__tablename__}
+# sqlite reports a full table scan as "SCAN Show" ("SCAN TABLE Show" before 3.36) and an index lookup as "SEARCH ...",
+# a "SCAN ... USING INDEX" walks an index in order, it is only fine if that order saves sorting the rows,
+# a "SCAN ... USING COVERING INDEX" reads only the (smaller) index, e.g. to aggregate the shows per venue
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?"?(\w+)"?')
+POSTGRES_SCAN = re.compile(r'Seq Scan on "?(\w+)"?')
+
+
+class QueryPlanTestCase(unittest.TestCase):
+    """
+    This class represents the query plan test case, every select statement
+    issued by a controller is explained against a seeded database and the test fails
+    if the plan reads a whole table instead of using an index.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Point the app to the test database and seed it once for all the tests."""
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        cls.ctx = app.app_context()
+        cls.ctx.push()
+        db.create_all()
+
+        now = datetime.datetime.now()
+        db.session.bulk_insert_mappings(Venue, [
+            {'id': i, 'name': f'Venue {i}', 'city': f'City {i % 20}', 'state': f'S{i % 5}'}
+            for i in range(1, VENUES_COUNT + 1)
+        ])
+        db.session.bulk_insert_mappings(Artist, [
+            {'id': i, 'name': f'Artist {i}'}
+            for i in range(1, ARTISTS_COUNT + 1)
+        ])
+        db.session.bulk_insert_mappings(VenueGenre, [
+            {'venue_id': i, 'genre': genre} for i in range(1, VENUES_COUNT + 1) for genre in GENRES[i % 3:i % 3 + 2]
+        ])
+        db.session.bulk_insert_mappings(ArtistGenre, [
+            {'artist_id': i, 'genre': genre} for i in range(1, ARTISTS_COUNT + 1) for genre in GENRES[i % 4:i % 4 + 2]
+        ])
+        db.session.bulk_insert_mappings(Show, [
+            {'artist_id': i % ARTISTS_COUNT + 1, 'venue_id': i % VENUES_COUNT + 1,
+             'start_time': now + datetime.timedelta(hours=i - SHOWS_COUNT // 2)}
+            for i in range(SHOWS_COUNT)
+        ])
+        db.session.commit()
+        # refresh the planner statistics of postgresql, sqlite has none unless analyzed
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute('ANALYZE')
+            db.session.commit()
+        db.session.remove()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.ctx.pop()
+
+    def setUp(self):
+        self.client = app.test_client
+        self.statements = []
+        # the statements are only issued when the page is rendered
+        page_cache.backend = LRUCacheBackend()
+        event.listen(db.engine, 'before_cursor_execute', self.record_statement)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.record_statement)
+        db.session.remove()
+
+    def record_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            self.statements.append((statement, parameters))
+
+    def explain(self, statement, parameters):
+        """Returns the lines of the query plan of statement."""
+        connection = db.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            if db.engine.dialect.name == 'postgresql':
+                # with sequential scans disabled the planner only picks one if there is no usable index,
+                # so the result does not depend on the size of the seeded tables
+                cursor.execute('SET enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + statement, parameters)
+                lines = [row[0] for row in cursor.fetchall()]
+                cursor.execute('RESET enable_seqscan')
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+                lines = [row[-1] for row in cursor.fetchall()]
+            cursor.close()
+        finally:
+            connection.close()
+        return lines
+
+    def sequential_scans(self, lines):
+        """Returns the tables read by a sequential scan in the plan lines."""
+        pattern = POSTGRES_SCAN if db.engine.dialect.name == 'postgresql' else SQLITE_SCAN
+        # an index walked in a different order than the one the query needs is just a slower full scan
+        sorted_afterwards = any('TEMP B-TREE FOR ORDER BY' in line for line in lines)
+        tables = []
+        for line in lines:
+            match = pattern.search(line.strip())
+            if match and match.group(1) in TABLES and 'COVERING INDEX' not in line \
+                    and ('INDEX' not in line or sorted_afterwards):
+                tables.append(match.group(1))
+        return tables
+
+    def assert_indexed(self, url, method='get', **kwargs):
+        self.statements.clear()
+        res = getattr(self.client(), method)(url, **kwargs)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(self.statements)
+        for statement, parameters in self.statements:
+            lines = self.explain(statement, parameters)
+            self.assertEqual(self.sequential_scans(lines), [],
+                f'{url} runs a sequential scan:\n{statement}\n' + '\n'.join(lines))
+        return res
+
+    def next_page_url(self, res):
+        match = re.search(rb'href="([^"]*after=[^"]*)"', res.data)
+        self.assertIsNotNone(match)
+        return match.group(1).decode().replace('&amp;', '&')
+
+    def test_show_venue(self):
+        self.assert_indexed('/venues/7')
+
+    def test_show_artist(self):
+        self.assert_indexed('/artists/7')
+
+    def test_venues_by_area(self):
+        self.assert_indexed('/venues')
+
+    def test_venues_by_genre(self):
+        self.assert_indexed('/venues?genre=Folk')
+
+    def test_artists_pages(self):
+        res = self.assert_indexed('/artists')
+        self.assert_indexed(self.next_page_url(res))
+
+    def test_artists_by_genre_pages(self):
+        res = self.assert_indexed('/artists?genre=Folk&per_page=10')
+        self.assert_indexed(self.next_page_url(res))
+
+    def test_shows_pages(self):
+        res = self.assert_indexed('/shows')
+        self.assert_indexed(self.next_page_url(res))
+
+    def test_edit_forms(self):
+        self.assert_indexed('/venues/7/edit')
+        self.assert_indexed('/artists/7/edit')
+
+    def test_bulk_shows_lookup(self):
+        self.assert_indexed('/shows/bulk', method='post', json=[
+            {'artist_id': 3, 'venue_id': 4, 'start_time': '2030-01-01 20:00:00'}
+        ])
+
+    def test_search(self):
+        if db.engine.dialect.name != 'postgresql':
+            self.skipTest('substring search can only use the trigram indexes of postgresql')
+        self.assert_indexed('/venues/search', method='post', data={'search_term': 'venue 1'})
+        self.assert_indexed('/artists/search', method='post', data={'search_term': 'artist 1'})
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
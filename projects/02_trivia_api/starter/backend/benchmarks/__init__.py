@@ -0,0 +1,71 @@
+"""
+Helpers shared by the benchmarks, run them from the backend folder e.g.
+    python -m benchmarks.quiz
+The benchmarks use the sqlite database file benchmark.db of the backend folder unless BENCHMARK_DATABASE_URL is set,
+use a dedicated database as the benchmarks drop and recreate all the tables.
+"""
+import os
+from contextlib import contextmanager
+from sqlalchemy import event
+
+from flaskr import create_app
+from models import db
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DATABASE_URL = os.getenv(
+    "BENCHMARK_DATABASE_URL", "sqlite:///" + os.path.join(BACKEND_DIR, "benchmark.db")
+)
+
+
+def create_benchmark_app():
+    """
+    Creates the app bound to the benchmark database with fresh empty tables.
+    """
+    app = create_app({"DATABASE_PATH": BENCHMARK_DATABASE_URL})
+    db.drop_all()
+    db.create_all()
+    return app
+
+
+@contextmanager
+def count_statements():
+    """
+    Counts the sql statements executed inside the with block,
+    the yielded list holds the count as its only element.
+    """
+    counter = [0]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter[0] += 1
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def percentile(sorted_values, p):
+    """
+    Returns the nearest-rank percentile p (0 to 100) of the sorted values.
+    """
+    if not sorted_values:
+        return None
+    rank = max(int(round(p / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies, statement_counts):
+    """
+    Returns the latency percentiles (in milliseconds) and the statements per request of a series of requests.
+    """
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "statements_mean": round(sum(statement_counts) / len(statement_counts), 2),
+        "statements_max": max(statement_counts),
+    }
@@ -0,0 +1,64 @@
+"""
+Plays full quiz sessions through POST /quiz for categories of growing size,
+the number of sql statements per request should stay the same
+however many questions were already asked.
+    python -m benchmarks.quiz
+"""
+import time
+
+from models import db, Question, Category
+from benchmarks import create_benchmark_app, count_statements
+
+CATEGORY_SIZES = [10, 100, 500]
+
+
+def seed(size):
+    category = Category(f"Benchmark {size}")
+    category.insert()
+    db.session.bulk_insert_mappings(
+        Question,
+        [
+            {"question": f"Question {i}?", "answer": "yes", "category": category.id, "difficulty": 1}
+            for i in range(size)
+        ],
+    )
+    db.session.commit()
+    return category.format()
+
+
+def play_quiz(client, quiz_category):
+    """
+    Asks for questions until the category is exhausted,
+    returns the statement counts of the requests and the total elapsed time.
+    """
+    previous_questions = []
+    statement_counts = []
+    start = time.perf_counter()
+    while True:
+        with count_statements() as statements:
+            res = client.post(
+                "/quiz",
+                json={"previous_questions": previous_questions, "quiz_category": quiz_category},
+            )
+        statement_counts.append(statements[0])
+        question = res.get_json()["question"]
+        if question is None:
+            return statement_counts, time.perf_counter() - start
+        previous_questions.append(question["id"])
+
+
+def main():
+    app = create_benchmark_app()
+    client = app.test_client()
+    print(f"{'questions':>10} {'requests':>9} {'min stmts':>10} {'max stmts':>10} {'ms/request':>11}")
+    for size in CATEGORY_SIZES:
+        quiz_category = seed(size)
+        statement_counts, elapsed = play_quiz(client, quiz_category)
+        print(
+            f"{size:>10} {len(statement_counts):>9} {min(statement_counts):>10} "
+            f"{max(statement_counts):>10} {elapsed / len(statement_counts) * 1000:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Measures the read endpoints against question banks of growing size spread over many categories:
+deep pages of GET /questions (by page number and by cursor), POST /questions/search,
+GET /categories/<id>/questions and quiz sessions of QUIZ_LENGTH questions through POST /quiz.
+For every bank size and endpoint it reports the latency percentiles and the sql statements per request,
+a latency or statement count that grows with the bank size is a scaling regression.
+    python -m benchmarks.throughput
+    python -m benchmarks.throughput --sizes 1000 100000 --requests 50 --output results.json
+"""
+import json
+import time
+import random
+import argparse
+
+from models import db, Question, Category, category_registry
+from benchmarks import create_benchmark_app, count_statements, summarize
+
+BANK_SIZES = [1000, 100000, 1000000]
+CATEGORY_COUNT = 50
+# the frontend ends a quiz after 5 questions
+QUIZ_LENGTH = 5
+INSERT_CHUNK_SIZE = 10000
+# every question contains one common word, and one rare word shared by 1 question in RARE_WORD_EVERY
+COMMON_WORDS = ["capital", "river", "painter", "planet", "element"]
+RARE_WORD_EVERY = 1000
+
+
+def seed(size, category_count, rng):
+    """
+    Replaces the tables content with category_count categories and size questions,
+    inserted by one executemany statement per INSERT_CHUNK_SIZE rows.
+    """
+    db.session.query(Question).delete()
+    db.session.query(Category).delete()
+    db.session.execute(
+        Category.__table__.insert(),
+        [{"id": i, "type": f"Category {i}"} for i in range(1, category_count + 1)],
+    )
+    chunk = []
+    for i in range(size):
+        chunk.append(
+            {
+                "question": f"Which {rng.choice(COMMON_WORDS)} is number {i}"
+                + (f" zanzibar{i // RARE_WORD_EVERY}" if i % RARE_WORD_EVERY == 0 else "")
+                + "?",
+                "answer": f"Answer {i}",
+                "category": rng.randint(1, category_count),
+                "difficulty": rng.randint(1, 5),
+            }
+        )
+        if len(chunk) == INSERT_CHUNK_SIZE:
+            db.session.execute(Question.__table__.insert(), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(Question.__table__.insert(), chunk)
+    db.session.commit()
+    category_registry.invalidate()
+
+
+def measure(request, count):
+    """
+    Calls request count times, returns the summary of the latencies and statement counts.
+    """
+    latencies = []
+    statement_counts = []
+    for _ in range(count):
+        with count_statements() as statements:
+            start = time.perf_counter()
+            res = request()
+            latencies.append(time.perf_counter() - start)
+        assert res.status_code == 200, res.status_code
+        statement_counts.append(statements[0])
+    return summarize(latencies, statement_counts)
+
+
+def measure_quiz(client, category_count, sessions, rng):
+    """
+    Plays sessions quiz sessions in random categories (and some in all categories),
+    every request of the sessions is measured.
+    """
+    latencies = []
+    statement_counts = []
+    for session in range(sessions):
+        if session % 5 == 0:
+            quiz_category = {"type": "click", "id": 0}
+        else:
+            category_id = rng.randint(1, category_count)
+            quiz_category = {"type": f"Category {category_id}", "id": category_id}
+        previous_questions = []
+        for _ in range(QUIZ_LENGTH):
+            with count_statements() as statements:
+                start = time.perf_counter()
+                res = client.post(
+                    "/quiz",
+                    json={"previous_questions": previous_questions, "quiz_category": quiz_category},
+                )
+                latencies.append(time.perf_counter() - start)
+            assert res.status_code == 200, res.status_code
+            statement_counts.append(statements[0])
+            question = res.get_json()["question"]
+            if question is None:
+                break
+            previous_questions.append(question["id"])
+    return summarize(latencies, statement_counts)
+
+
+def run(client, size, category_count, requests, rng):
+    """
+    Returns the measures of every endpoint for a bank of size questions.
+    """
+    last_page = max((size + 9) // 10, 1)
+    # the cursor of the middle page is the id of the last question of the page before it
+    middle_cursor = (
+        db.session.query(Question.id).order_by(Question.id).offset(size // 2).limit(1).scalar()
+    )
+    db.session.remove()
+
+    return {
+        "GET /questions?page=1": measure(lambda: client.get("/questions?page=1"), requests),
+        "GET /questions?page=middle": measure(
+            lambda: client.get(f"/questions?page={last_page // 2 or 1}"), requests
+        ),
+        "GET /questions?page=last": measure(lambda: client.get(f"/questions?page={last_page}"), requests),
+        "GET /questions?after=middle": measure(
+            lambda: client.get(f"/questions?after={middle_cursor or 0}"), requests
+        ),
+        "POST /questions/search common": measure(
+            lambda: client.post("/questions/search", json={"searchTerm": rng.choice(COMMON_WORDS)}),
+            requests,
+        ),
+        "POST /questions/search rare": measure(
+            lambda: client.post(
+                "/questions/search",
+                json={"searchTerm": f"zanzibar{rng.randrange(max(size // RARE_WORD_EVERY, 1))}"},
+            ),
+            requests,
+        ),
+        "GET /categories/<id>/questions": measure(
+            lambda: client.get(f"/categories/{rng.randint(1, category_count)}/questions"), requests
+        ),
+        "POST /quiz": measure_quiz(client, category_count, max(requests // QUIZ_LENGTH, 1), rng),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=BANK_SIZES, help="question bank sizes")
+    parser.add_argument("--categories", type=int, default=CATEGORY_COUNT)
+    parser.add_argument("--requests", type=int, default=20, help="requests per endpoint and bank size")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the results to this json file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    app = create_benchmark_app()
+    # slow statements are expected with the large banks, they are measured rather than logged
+    app.config["SLOW_QUERY_THRESHOLD_MS"] = None
+    client = app.test_client()
+    results = {"categories": args.categories, "requests": args.requests, "sizes": {}}
+
+    print(f"{'questions':>10} {'endpoint':<32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'stmts':>6}")
+    for size in args.sizes:
+        start = time.perf_counter()
+        seed(size, args.categories, rng)
+        print(f"{size:>10} seeded in {time.perf_counter() - start:.1f}s")
+        results["sizes"][size] = run(client, size, args.categories, args.requests, rng)
+        for endpoint, result in results["sizes"][size].items():
+            print(
+                f"{size:>10} {endpoint:<32} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                f"{result['p99_ms']:>9.2f} {result['statements_max']:>6}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+""" Connection pool settings and metrics for the Flask-SQLAlchemy engine.
+
+PooledSQLAlchemy is a drop-in replacement of flask_sqlalchemy.SQLAlchemy, when the engine is created
+it reads the pool settings from the app config (falling back to environment variables of the same name):
+  DATABASE_POOL_SIZE                   connections kept open (default 5)
+  DATABASE_MAX_OVERFLOW                extra connections opened under load (default 10)
+  DATABASE_POOL_TIMEOUT                seconds to wait for a free connection before failing (default 30)
+  DATABASE_POOL_RECYCLE                seconds after which a connection is replaced, -1 to never (default 1800)
+  DATABASE_POOL_PRE_PING               test connections before using them (default true)
+  DATABASE_POOL_LEAK_WARNING_SECONDS   warn about connections held for longer (default 30)
+Sqlite databases keep the pool chosen by Flask-SQLAlchemy and its settings, only the leak warnings apply to them.
+
+db.pool_metrics counts the checkouts, the checkouts that had to wait for a connection and their latency,
+and logs a warning for every connection that is held for too long, e.g. a session that is never removed.
+Set db.pool_metrics.emit to a function(name, value) to forward every measure to a metrics system.
+
+Every project of the repository is installed and deployed on its own, so each one has a copy of this module.
+The copies must stay identical, projects/test_shared_modules.py compares them and tests every copy.
+"""
+import os
+import time
+import logging
+import threading
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+POOL_SETTINGS = {
+    'DATABASE_POOL_SIZE': (int, 5),
+    'DATABASE_MAX_OVERFLOW': (int, 10),
+    'DATABASE_POOL_TIMEOUT': (float, 30),
+    'DATABASE_POOL_RECYCLE': (int, 1800),
+    'DATABASE_POOL_PRE_PING': (lambda value: str(value).lower() in ('1', 'true', 'yes'), True),
+    'DATABASE_POOL_LEAK_WARNING_SECONDS': (float, 30),
+}
+
+
+def pool_settings(config):
+    """ Returns the pool settings of config, settings missing from config are read from the environment """
+    settings = {}
+    for name, (convert, default) in POOL_SETTINGS.items():
+        value = config.get(name, os.getenv(name))
+        settings[name] = default if value is None else convert(value)
+    return settings
+
+
+class PoolMetrics:
+    """ Collects the metrics of a connection pool, see stats() """
+
+    def __init__(self, leak_warning_seconds=30, emit=None):
+        self.leak_warning_seconds = leak_warning_seconds
+        self.emit = emit
+        self.checkouts = 0
+        self.waits = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+        self.leak_warnings = 0
+        # checkout time of the connections that are checked out, by connection record
+        self._checked_out = {}
+        self._lock = threading.Lock()
+
+    def _emit(self, name, value):
+        if self.emit is not None:
+            self.emit(name, value)
+
+    def record_checkout(self, seconds, waited):
+        """ Records the time taken to get a connection from the pool, waited is True if none was free """
+        with self._lock:
+            self.checkouts += 1
+            self.waits += waited
+            self.checkout_seconds_total += seconds
+            self.checkout_seconds_max = max(self.checkout_seconds_max, seconds)
+        self._emit('db.pool.checkout_seconds', seconds)
+        if waited:
+            self._emit('db.pool.waits', 1)
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self._checked_out[connection_record] = [time.monotonic(), False]
+        self.warn_leaks()
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            checkout = self._checked_out.pop(connection_record, None)
+        if checkout is None:
+            return
+        held = time.monotonic() - checkout[0]
+        self._emit('db.pool.held_seconds', held)
+        if held > self.leak_warning_seconds and not checkout[1]:
+            self._warn_leak(held, returned=True)
+
+    def _warn_leak(self, held, returned):
+        with self._lock:
+            self.leak_warnings += 1
+        self._emit('db.pool.leak_warnings', 1)
+        logger.warning('A database connection was %s after %.1f seconds, a session may not be removed',
+            'returned to the pool' if returned else 'still checked out', held)
+
+    def warn_leaks(self):
+        """ Logs a warning, once, for every connection checked out for longer than leak_warning_seconds """
+        now = time.monotonic()
+        leaked = []
+        with self._lock:
+            for checkout in self._checked_out.values():
+                if not checkout[1] and now - checkout[0] > self.leak_warning_seconds:
+                    checkout[1] = True
+                    leaked.append(now - checkout[0])
+        for held in leaked:
+            self._warn_leak(held, returned=False)
+
+    def events(self):
+        """ The pool_events argument of create_engine that feeds these metrics """
+        return [(self.on_checkout, 'checkout'), (self.on_checkin, 'checkin')]
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'checkout_seconds_avg': self.checkout_seconds_total / self.checkouts if self.checkouts else 0.0,
+                'checkout_seconds_max': self.checkout_seconds_max,
+                'checked_out': len(self._checked_out),
+                'oldest_checkout_seconds': max((now - checkout[0] for checkout in self._checked_out.values()),
+                    default=0.0),
+                'leak_warnings': self.leak_warnings,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """ A QueuePool that reports how long each checkout takes and whether it had to wait to metrics """
+
+    def __init__(self, creator, metrics=None, **kw):
+        super().__init__(creator, **kw)
+        self.metrics = metrics
+
+    def _do_get(self):
+        # every checkout path of the pool (connect, unique_connection) gets its connection record here
+        if self.metrics is None:
+            return super()._do_get()
+        # every connection is in use and no more can be opened, the checkout waits for one to be returned
+        waited = self.checkedin() == 0 and self._max_overflow > -1 and self.overflow() >= self._max_overflow
+        started = time.monotonic()
+        record = super()._do_get()
+        self.metrics.record_checkout(time.monotonic() - started, waited)
+        return record
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class PooledSQLAlchemy(SQLAlchemy):
+    """ flask_sqlalchemy.SQLAlchemy with the pool settings of the app config and pool metrics """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_metrics = PoolMetrics()
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        rv = super().apply_driver_hacks(app, sa_url, options)
+        settings = pool_settings(app.config)
+        self.pool_metrics.leak_warning_seconds = settings['DATABASE_POOL_LEAK_WARNING_SECONDS']
+        options['pool_events'] = self.pool_metrics.events()
+        # sqlite connections are not shared between threads, keep the pool flask_sqlalchemy picked for them.
+        # An in-memory database lives in its single connection, recycling it would drop the whole database
+        if not sa_url.drivername.startswith('sqlite'):
+            options['pool_pre_ping'] = settings['DATABASE_POOL_PRE_PING']
+            options['pool_recycle'] = settings['DATABASE_POOL_RECYCLE']
+            options['poolclass'] = InstrumentedQueuePool
+            options['pool_size'] = settings['DATABASE_POOL_SIZE']
+            options['max_overflow'] = settings['DATABASE_MAX_OVERFLOW']
+            options['pool_timeout'] = settings['DATABASE_POOL_TIMEOUT']
+            options['metrics'] = self.pool_metrics
+        return rv
@@ -1,12 +1,23 @@
 import os
+import click
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func
 from flask_cors import CORS
 import random
 import sys
 
-from models import setup_db, Question, Category, db
+from models import setup_db, database_path, Question, Category, db, category_registry
+from sql_timing import init_sql_timing
+from flaskr.importer import (
+    decode_lines,
+    iter_rows,
+    import_questions,
+    FORMATS,
+    DEFAULT_CHUNK_SIZE,
+    MAX_CHUNK_SIZE,
+)
+from flaskr.search import init_search, find_questions
+from flaskr.migrations import upgrade_question_category, upgrade_question_search
 
 QUESTIONS_PER_PAGE = 10
 
@@ -14,7 +25,13 @@ QUESTIONS_PER_PAGE = 10
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
-    setup_db(app)
+    if test_config is not None:
+        app.config.from_mapping(test_config)
+    setup_db(app, app.config.get("DATABASE_PATH", database_path))
+    # the statement count and database time of each request are sent in the Server-Timing header
+    init_sql_timing(app, db)
+    # the in-process search index is rebuilt after the questions change
+    init_search()
 
     """
   @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
@@ -47,33 +64,25 @@ def create_app(test_config=None):
         Create an endpoint to handle GET requests
         for all available categories.
         """
-        all_categories = Category.query.all()
-        categories = {}
-        for category in all_categories:
-            categories[category.id] = category.type
+        categories = category_registry.get_map()
         return jsonify(
             {"success": True, "categories": categories, "count": len(categories)}
         )
 
-    def paginate_questions(page, questions):
-        page_start = (page - 1) * QUESTIONS_PER_PAGE
-        page_end = page_start + QUESTIONS_PER_PAGE
-        questions_count = len(questions)
-        page_questions = []
-
-        # Handle case if the last page has less than 10 questions
-        # no need for the 'Anded' condition but added as further explanation
-        if page_end > questions_count and page_start < questions_count:
-            page_end = questions_count
-
-        page_questions = questions[page_start:page_end]
-        # if page_start and page_end are out of range the page_question will be an empty list
-        # and it's length will be 0
-        page_empty = False
-        if len(page_questions) == 0:
-            page_empty = True
-
-        return page_questions, page_empty
+    def paginate_questions(query, page, after=None):
+        """
+        Returns a page of the questions of the query ordered by id,
+        only the questions of the requested page are fetched from the database.
+        If after (a question id) is given the page starts right after that question,
+        this keyset cursor lets the database skip to the page using the primary key index
+        instead of reading and discarding all the rows of the previous pages like an offset does.
+        """
+        query = query.order_by(Question.id)
+        if after is not None:
+            query = query.filter(Question.id > after)
+        else:
+            query = query.offset((page - 1) * QUESTIONS_PER_PAGE)
+        return query.limit(QUESTIONS_PER_PAGE).all()
 
     @app.route("/questions", methods=["GET"])
     def get_questions():
@@ -90,30 +99,36 @@ def create_app(test_config=None):
         """
         # get a page number if any from request
         page = request.args.get("page", 1, type=int)
+        # or the id of the last question of the previous page
+        after = request.args.get("after", None, type=int)
+        if page < 1:
+            abort(400)
 
-        questions, page_empty = paginate_questions(page, Question.query.all())
-        ## if the length of requested page is 0, then page_empty will be True
-        if page_empty:
+        questions = paginate_questions(Question.query, page, after)
+        questions_count = Question.query.count()
+        # the id of the last question is the cursor of the next page
+        next_cursor = None
+        if len(questions) == QUESTIONS_PER_PAGE:
+            next_cursor = questions[-1].id
+
+        ## if the requested page is empty, then return an empty list
+        if len(questions) == 0:
             # should I abort or return an empty list?
             return jsonify(
                 {
                     "success": True,
                     "questions": [],
-                    "total_questions": Question.query.count(),
+                    "total_questions": questions_count,
                     "categories": {},
                     "current_category": None,
+                    "next_cursor": None,
                 }
             )
 
         formatted_questions = [question.format() for question in questions]
 
-        questions_count = Question.query.count()
-
-        categories = {}
-        all_categories = Category.query.all()
-        # create a dictionary (map) with keys as the category id, and values as the category type
-        for cat in all_categories:
-            categories[cat.id] = cat.type
+        # a dictionary (map) with keys as the category id, and values as the category type
+        categories = category_registry.get_map()
 
         return jsonify(
             {
@@ -122,6 +137,7 @@ def create_app(test_config=None):
                 "total_questions": questions_count,
                 "categories": categories,
                 "current_category": None,
+                "next_cursor": next_cursor,
             }
         )
 
@@ -176,6 +192,11 @@ def create_app(test_config=None):
             # then it was a bad requestion
         except KeyError:
             abort(400)
+        try:
+            # the form of the frontend sends the category id as a string
+            category = int(category)
+        except (TypeError, ValueError):
+            abort(400)
 
         try:
             new_question = Question(question, answer, category, difficulty)
@@ -194,6 +215,81 @@ def create_app(test_config=None):
 
         return jsonify({"success": True, "id": new_question.id})
 
+    @app.route("/questions/import", methods=["POST"])
+    def bulk_import_questions():
+        """
+        Imports many questions from an NDJSON (one question object per line) or CSV
+        (with a header row) request body. The format is taken from the "format" request argument,
+        otherwise it is CSV if the content type is text/csv and NDJSON if not.
+        The body is streamed and inserted in batches of "chunk_size" rows,
+        the response reports the inserted and rejected rows and the throughput of each batch.
+        """
+        format = request.args.get("format")
+        if format is None:
+            format = "csv" if request.mimetype == "text/csv" else "ndjson"
+        chunk_size = request.args.get("chunk_size", DEFAULT_CHUNK_SIZE, type=int)
+        if format not in FORMATS or not 1 <= chunk_size <= MAX_CHUNK_SIZE:
+            abort(400)
+
+        # a row that is not utf-8 or not valid csv is rejected, a csv header that cannot be read fails the import
+        try:
+            report = import_questions(iter_rows(decode_lines(request.stream), format), chunk_size)
+        except ValueError:
+            abort(400)
+        report["success"] = True
+        return jsonify(report)
+
+    @app.cli.command("import-questions")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", type=click.Choice(FORMATS), default=None,
+                  help="Defaults to csv for .csv files and ndjson otherwise.")
+    @click.option("--chunk-size", type=click.IntRange(1, MAX_CHUNK_SIZE), default=DEFAULT_CHUNK_SIZE)
+    def import_questions_command(path, format, chunk_size):
+        """
+        Imports the questions of an NDJSON or CSV file, e.g.
+            flask import-questions questions.csv --chunk-size 5000
+        """
+        if format is None:
+            format = "csv" if path.lower().endswith(".csv") else "ndjson"
+
+        def print_batch(batch):
+            click.echo(
+                f"batch {batch['batch']}: {batch['inserted']} inserted, {batch['rejected']} rejected, "
+                f"{batch['seconds']}s ({batch['rows_per_second'] or 0} rows/s)"
+            )
+
+        with open(path, "rb") as lines:
+            try:
+                report = import_questions(iter_rows(decode_lines(lines), format), chunk_size, on_batch=print_batch)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+
+        for rejected in report["rejected_rows"]:
+            click.echo(f"line {rejected['line']}: {rejected['error']}", err=True)
+        click.echo(f"{report['inserted']} questions inserted, {report['rejected']} rows rejected")
+
+    @app.cli.command("upgrade-question-category")
+    def upgrade_question_category_command():
+        """
+        Converts questions.category of an existing database to an indexed integer foreign key, see flaskr/migrations.py
+        """
+        with db.engine.begin() as connection:
+            changes = upgrade_question_category(connection)
+        for change in changes:
+            click.echo(change)
+        click.echo("questions.category is up to date" if not changes else f"{len(changes)} change(s) made")
+
+    @app.cli.command("upgrade-question-search")
+    def upgrade_question_search_command():
+        """
+        Creates the full text search index of an existing postgres database, see flaskr/migrations.py
+        """
+        with db.engine.begin() as connection:
+            changes = upgrade_question_search(connection)
+        for change in changes:
+            click.echo(change)
+        click.echo("the question search index is up to date" if not changes else f"{len(changes)} change(s) made")
+
     @app.route("/questions/search", methods=["POST"])
     def search_questions():
         """
@@ -205,6 +301,11 @@ def create_app(test_config=None):
         TEST: Search by any phrase. The questions list will update to include
         only question that include that string within their question.
         Try using the word "title" to start.
+
+        The questions whose question or answer contain all the words of searchTerm
+        (the last word may be the start of a word) are ranked by relevance and paginated,
+        the optional "page" (default 1) and "category" (a category id) of the body
+        select the page and restrict the search to a category, see flaskr/search.py.
         """
 
         body = request.get_json()
@@ -216,20 +317,33 @@ def create_app(test_config=None):
             abort(400)
 
         search_term = body.get('searchTerm')
+        page = body.get("page", 1)
+        category_id = body.get("category")
+        if not isinstance(search_term, str) or not isinstance(page, int) or page < 1:
+            abort(400)
 
-        questions = Question.query.filter(
-            Question.question.ilike(f"%{search_term}%")
-        ).all()
+        current_category = None
+        if category_id is not None:
+            categories = category_registry.get_map()
+            if not isinstance(category_id, int) or category_id not in categories:
+                abort(404)
+            current_category = {"id": category_id, "type": categories[category_id]}
+
+        questions, total_questions = find_questions(
+            search_term, page, QUESTIONS_PER_PAGE, category_id
+        )
         questions = [q.format() for q in questions]
         return jsonify(
             {
+                "success": True,
                 "questions": questions,
-                "total_question": len(questions),
-                "current_category": None,
+                "total_questions": total_questions,
+                "current_category": current_category,
+                "page": page,
             }
         )
 
-    @app.route("/categories/<category_id>/questions", methods=["GET"])
+    @app.route("/categories/<int:category_id>/questions", methods=["GET"])
     def get_category_questions(category_id):
         """
         @TODO:
@@ -266,28 +380,26 @@ def create_app(test_config=None):
             }
         )
 
-    def check_out_of_unique_questions(previous_questions, quiz_category):
-        category_id = quiz_category["id"]
-        questions_in_category_count = Question.query.filter_by(
-            category=category_id
-        ).count()
-        # previous_questions_with_current_category_count = 0
-        counter = questions_in_category_count
-        out_of_questions = False
-        for q in previous_questions:
-            if Question.query.get(q).category == int(category_id):
-                counter -= 1
-                if counter == 0:
-                    out_of_questions = True
-                    break
-        if counter <= 0:
-            out_of_questions = True
-        return out_of_questions
+    def pick_unseen_question(category_id, previous_questions):
+        """
+        Returns a random question of the category that is not one of the previous questions,
+        or None if all the questions of the category were already asked.
+        The unseen questions are counted by one query, and the question is picked by a second query
+        at a random offset, so the number of queries does not depend on how many questions were asked.
+        """
+        # the (category, id) index gives the unseen questions of the category in id order
+        unseen = Question.query.filter(Question.category == category_id)
+        if previous_questions:
+            unseen = unseen.filter(~Question.id.in_(previous_questions))
+
+        unseen_count = unseen.count()
+        if unseen_count == 0:
+            return None
+        return unseen.order_by(Question.id).offset(random.randrange(unseen_count)).first()
 
     def pick_random_category():
-        category_count = Category.query.count()
-        quiz_category = Category.query.order_by(func.random()).first()
-        return quiz_category
+        # picked from the categories kept in memory, no query is needed
+        return category_registry.random_category()
 
     @app.route("/quiz", methods=["POST"])
     def quiz_next_question():
@@ -319,34 +431,17 @@ def create_app(test_config=None):
             # if all categories is selected
             # then quiz_category= {'type': 'click', 'id': 0}}
             if quiz_category["type"] == "click":
-                quiz_category = pick_random_category().format()
+                quiz_category = pick_random_category()
+                if quiz_category is None:
+                    abort(400)
             # random_question
 
-            out_of_questions = check_out_of_unique_questions(
-                previous_questions, quiz_category
-            )
-            # if i am out of questions, i will repeat one of the previous questions
-            # until i am specified otherwise
-            category_id = quiz_category["id"]
+            new_question = pick_unseen_question(int(quiz_category["id"]), previous_questions)
 
-            if out_of_questions:
+            if new_question is None:
                 # send no question and indicate that the quiz has ended
                 return jsonify({"success": True, "question": None})
 
-            if Question.query.filter_by(category=category_id).count() == 0:
-            # bad request as there is no such category
-                abort(400)
-            else:
-                # i believe this loop takes some time and picking a non repeated question
-                # could be done more efficiently
-                while True:
-                    new_question = (
-                        Question.query.filter_by(category=category_id)
-                        .order_by(func.random())
-                        .first()
-                    )
-                    if new_question.id not in previous_questions:
-                        break
             new_question = new_question.format()
 
         except Exception as e:
@@ -0,0 +1,162 @@
+import csv
+import json
+import time
+
+from models import db, Question, category_registry
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_CHUNK_SIZE = 10000
+# only the first rejected rows are reported in detail, the rest are only counted
+MAX_REPORTED_REJECTIONS = 1000
+
+FORMATS = ("ndjson", "csv")
+QUESTION_FIELDS = ("question", "answer", "category", "difficulty")
+
+
+def decode_lines(lines, encoding="utf-8"):
+    """
+    Returns an iterator of the text lines of the byte lines of an upload.
+    A line that cannot be decoded raises UnicodeDecodeError when it is reached,
+    unlike a text stream the iterator goes on with the next line afterwards.
+    """
+    return map(lambda line: line.decode(encoding), lines)
+
+
+def iter_rows(lines, format):
+    """
+    Parses the lines of an NDJSON or CSV (with a header row) document,
+    yields (line number, row) pairs where row is a dictionary, or None if the line cannot be parsed
+    (including a line that cannot be decoded, see decode_lines).
+    The lines are read lazily so a large upload is never held in memory at once.
+    Raises ValueError if the header row of a CSV document cannot be read.
+    """
+    lines = iter(lines)
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        try:
+            reader.fieldnames
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise ValueError(f"unreadable csv header: {e}") from e
+        # the lines that could not be decoded, the csv reader does not count them
+        skipped = 0
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except UnicodeDecodeError:
+                skipped += 1
+                row = None
+            except csv.Error:
+                row = None
+            # the line count of the csv reader, the one of the DictReader is only updated by the valid rows
+            yield reader.reader.line_num + skipped, row
+
+    line_number = 0
+    while True:
+        line_number += 1
+        try:
+            line = next(lines).strip()
+        except StopIteration:
+            return
+        except UnicodeDecodeError:
+            yield line_number, None
+            continue
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def validate_row(row, category_ids):
+    """
+    Returns (values, error), values are the column values of a new question
+    and error is None, or values is None and error describes why the row was rejected.
+    """
+    if row is None:
+        return None, "malformed row"
+
+    missing = [field for field in QUESTION_FIELDS if row.get(field) in (None, "")]
+    if missing:
+        return None, f"missing {', '.join(missing)}"
+
+    try:
+        difficulty = int(row["difficulty"])
+        category = int(row["category"])
+    except (TypeError, ValueError):
+        return None, "difficulty and category must be integers"
+
+    if category not in category_ids:
+        return None, f"unknown category {category}"
+
+    return {
+        "question": str(row["question"]),
+        "answer": str(row["answer"]),
+        "category": category,
+        "difficulty": difficulty,
+    }, None
+
+
+def import_questions(rows, chunk_size=DEFAULT_CHUNK_SIZE, on_batch=None):
+    """
+    Validates and inserts the (line number, row) pairs yielded by iter_rows in batches of chunk_size rows,
+    each batch is inserted by one executemany statement and committed on its own,
+    so a failing batch does not undo the batches before it.
+    on_batch, if given, is called with the report of each batch as soon as it is committed.
+    Returns a report of the whole import.
+    """
+    category_ids = set(category_registry.get_map())
+    report = {"inserted": 0, "rejected": 0, "rejected_rows": [], "batches": []}
+
+    def reject(line_number, error):
+        report["rejected"] += 1
+        if len(report["rejected_rows"]) < MAX_REPORTED_REJECTIONS:
+            report["rejected_rows"].append({"line": line_number, "error": error})
+
+    def flush(batch, batch_rejected, started):
+        # batch is a list of (line number, values) pairs
+        inserted = 0
+        if batch:
+            try:
+                db.session.execute(Question.__table__.insert(), [values for _, values in batch])
+                db.session.commit()
+                inserted = len(batch)
+            except Exception as e:
+                db.session.rollback()
+                for line_number, _ in batch:
+                    reject(line_number, f"insert failed: {e.__class__.__name__}")
+                batch_rejected += len(batch)
+        # the time to parse, validate and insert the batch
+        seconds = time.perf_counter() - started
+        batch_report = {
+            "batch": len(report["batches"]) + 1,
+            "inserted": inserted,
+            "rejected": batch_rejected,
+            "seconds": round(seconds, 4),
+            "rows_per_second": round(inserted / seconds) if seconds and inserted else None,
+        }
+        report["inserted"] += inserted
+        report["batches"].append(batch_report)
+        if on_batch is not None:
+            on_batch(batch_report)
+
+    batch, batch_rejected, started = [], 0, time.perf_counter()
+    for line_number, row in rows:
+        values, error = validate_row(row, category_ids)
+        if error is not None:
+            reject(line_number, error)
+            batch_rejected += 1
+        else:
+            batch.append((line_number, values))
+
+        if len(batch) + batch_rejected >= chunk_size:
+            flush(batch, batch_rejected, started)
+            batch, batch_rejected, started = [], 0, time.perf_counter()
+
+    if batch or batch_rejected:
+        flush(batch, batch_rejected, started)
+
+    return report
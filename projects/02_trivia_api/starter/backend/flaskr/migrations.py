@@ -0,0 +1,87 @@
+"""
+Schema changes for databases created before the models changed, db.create_all() only creates missing tables.
+Every upgrade checks the current schema first, so running it again does nothing.
+    flask upgrade-question-category
+    flask upgrade-question-search
+"""
+from sqlalchemy import Integer, inspect
+
+from models import Question
+from flaskr.search import SEARCH_INDEX, SEARCH_INDEX_SQL
+
+CATEGORY_INDEX = "ix_questions_category_id"
+
+
+def upgrade_question_category(connection):
+    """
+    Converts questions.category from a string to an integer foreign key to categories.id
+    and creates the (category, id) index. A category that is not the id of a category becomes null.
+    Returns the list of the changes made.
+    """
+    inspector = inspect(connection)
+    columns = {column["name"]: column for column in inspector.get_columns("questions")}
+    is_integer = isinstance(columns["category"]["type"], Integer)
+    has_foreign_key = any(
+        foreign_key["referred_table"] == "categories" for foreign_key in inspector.get_foreign_keys("questions")
+    )
+    has_index = any(index["name"] == CATEGORY_INDEX for index in inspector.get_indexes("questions"))
+    changes = []
+
+    if connection.dialect.name == "sqlite":
+        # sqlite cannot change the type of a column or add a constraint, the table is rebuilt
+        if not is_integer or not has_foreign_key:
+            # index names are shared by all the tables, the index of the old table would clash with the new one
+            connection.execute(f"DROP INDEX IF EXISTS {CATEGORY_INDEX}")
+            connection.execute("ALTER TABLE questions RENAME TO questions_before_upgrade")
+            # creates the table and its indexes as defined by the model
+            Question.__table__.create(connection)
+            connection.execute(
+                "INSERT INTO questions (id, question, answer, category, difficulty) "
+                "SELECT id, question, answer, "
+                "CASE WHEN category IN (SELECT CAST(id AS TEXT) FROM categories) THEN CAST(category AS INTEGER) END, "
+                "difficulty FROM questions_before_upgrade"
+            )
+            connection.execute("DROP TABLE questions_before_upgrade")
+            return ["rebuilt questions with an integer category foreign key and its index"]
+    else:
+        if not is_integer:
+            connection.execute(
+                "ALTER TABLE questions ALTER COLUMN category TYPE integer "
+                "USING CASE WHEN category ~ '^[0-9]+$' THEN category::integer END"
+            )
+            changes.append("converted questions.category to integer")
+        if not has_foreign_key:
+            connection.execute(
+                "UPDATE questions SET category = NULL "
+                "WHERE category IS NOT NULL AND category NOT IN (SELECT id FROM categories)"
+            )
+            connection.execute(
+                "ALTER TABLE questions ADD CONSTRAINT category FOREIGN KEY (category) "
+                "REFERENCES categories (id) ON UPDATE CASCADE ON DELETE SET NULL"
+            )
+            changes.append("added the questions.category foreign key")
+
+    if not has_index:
+        connection.execute(f"CREATE INDEX {CATEGORY_INDEX} ON questions (category, id)")
+        changes.append(f"created {CATEGORY_INDEX}")
+    return changes
+
+
+def upgrade_question_search(connection):
+    """
+    Creates the GIN full text index of the question search on postgres, see flaskr/search.py.
+    Other databases search an index kept in memory and are left unchanged.
+    Returns the list of the changes made.
+    """
+    if connection.dialect.name != "postgresql":
+        return []
+    # the inspector skips expression indexes, the catalog is read instead
+    has_index = connection.scalar(
+        "SELECT 1 FROM pg_indexes WHERE schemaname = current_schema() "
+        "AND tablename = 'questions' AND indexname = %(name)s",
+        name=SEARCH_INDEX,
+    )
+    if has_index:
+        return []
+    connection.execute(SEARCH_INDEX_SQL)
+    return [f"created {SEARCH_INDEX}"]
@@ -0,0 +1,240 @@
+import re
+import math
+import heapq
+import bisect
+import threading
+from sqlalchemy import DDL, event, func, literal_column
+from sqlalchemy.engine import Engine
+
+from models import db, Question
+
+# the text search configuration, "simple" keeps every word (no stop words, no stemming)
+# so the words matched by postgres are the words matched by the in-process index
+SEARCH_CONFIG = "simple"
+# weight of a word of the question and of a word of the answer in the ranking,
+# the default weights of the postgres ts_rank_cd function for the A and B labels
+QUESTION_WEIGHT = 1.0
+ANSWER_WEIGHT = 0.4
+# questions read at once when the in-process index is built
+INDEX_BUILD_BATCH_SIZE = 10000
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# the searched document of a question, the GIN index and the queries must use the same expression
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(question, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(answer, '')), 'B')"
+)
+
+SEARCH_INDEX = "ix_questions_search"
+# created with the table, and by flask upgrade-question-search for the databases created before it existed
+SEARCH_INDEX_SQL = f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} ON questions USING gin (({SEARCH_VECTOR_SQL}))"
+
+event.listen(Question.__table__, "after_create", DDL(SEARCH_INDEX_SQL).execute_if(dialect="postgresql"))
+
+
+def tokenize(text):
+    """
+    returns the lower case words of text
+    """
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+"""
+QuestionIndex
+    an inverted index of the words of the questions and answers, kept in memory for the databases
+    without full text search (sqlite). It is built by one pass over the questions table on the first search,
+    and rebuilt on the next search after any insert, update or delete on the questions table.
+"""
+
+
+class QuestionIndex:
+    def __init__(self):
+        self.builds = 0
+        # word -> {question id: weighted count of the word in the question and answer}
+        self._postings = None
+        # the words sorted, to find the words starting with a prefix
+        self._words = None
+        # question id -> category
+        self._categories = None
+        # incremented by invalidate(), a build started before an invalidation is not kept
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _build(self):
+        postings = {}
+        categories = {}
+        rows = (
+            db.session.query(Question.id, Question.question, Question.answer, Question.category)
+            .yield_per(INDEX_BUILD_BATCH_SIZE)
+        )
+        for question_id, question, answer, category in rows:
+            categories[question_id] = category
+            for words, weight in ((tokenize(question), QUESTION_WEIGHT), (tokenize(answer), ANSWER_WEIGHT)):
+                for word in words:
+                    counts = postings.setdefault(word, {})
+                    counts[question_id] = counts.get(question_id, 0) + weight
+        return postings, sorted(postings), categories
+
+    def _load(self):
+        with self._lock:
+            if self._postings is not None:
+                return self._postings, self._words, self._categories
+            generation = self._generation
+        postings, words, categories = self._build()
+        with self._lock:
+            self.builds += 1
+            if generation == self._generation:
+                self._postings, self._words, self._categories = postings, words, categories
+        return postings, words, categories
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._postings = self._words = self._categories = None
+
+    def search(self, words, category=None, limit=None):
+        """
+        returns the ids of the questions containing all the words (the last one may be the start of a word)
+        ranked by relevance, at most limit of them, and the count of all the matching questions.
+        """
+        postings, sorted_words, categories = self._load()
+        question_count = len(categories)
+        scores = None
+        for position, word in enumerate(words):
+            if position == len(words) - 1:
+                # the last word is matched as a prefix, the user may not have finished typing it
+                start = end = bisect.bisect_left(sorted_words, word)
+                while end < len(sorted_words) and sorted_words[end].startswith(word):
+                    end += 1
+                matching = sorted_words[start:end]
+            else:
+                matching = [word] if word in postings else []
+
+            word_scores = {}
+            for candidate in matching:
+                counts = postings[candidate]
+                idf = math.log(1 + question_count / len(counts))
+                for question_id, count in counts.items():
+                    word_scores[question_id] = max(word_scores.get(question_id, 0), count * idf)
+
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {question_id: score + word_scores[question_id]
+                          for question_id, score in scores.items() if question_id in word_scores}
+            if not scores:
+                return [], 0
+
+        if category is not None:
+            scores = {question_id: score for question_id, score in scores.items()
+                      if categories[question_id] == category}
+        ranked = scores.items()
+        if limit is not None:
+            ranked = heapq.nsmallest(limit, ranked, key=lambda item: (-item[1], item[0]))
+        else:
+            ranked = sorted(ranked, key=lambda item: (-item[1], item[0]))
+        return [question_id for question_id, _ in ranked], len(scores)
+
+
+question_index = QuestionIndex()
+
+
+# the session using a connection, in the connection info, and the flag of a session that wrote questions
+SESSION_KEY = "question_index_session"
+WRITTEN_KEY = "question_index_written"
+
+
+def track_session_connection(session, transaction, connection):
+    connection.info[SESSION_KEY] = session
+
+
+def invalidate_on_question_writes(conn, cursor, statement, parameters, context, executemany):
+    # only the statements compiled from the questions table are recognized, not textual sql
+    if context is None or context.compiled is None:
+        return
+    if (context.isinsert or context.isupdate or context.isdelete) and getattr(
+        context.compiled.statement, "table", None
+    ) is Question.__table__:
+        question_index.invalidate()
+        session = conn.info.get(SESSION_KEY)
+        if session is not None:
+            session.info[WRITTEN_KEY] = True
+
+
+def invalidate_after_transaction(session):
+    # an index built between the write and the end of its transaction read the questions before the commit,
+    # (or the rows of a transaction that was rolled back), it is dropped once the transaction has ended
+    if session.info.pop(WRITTEN_KEY, False):
+        question_index.invalidate()
+
+
+def listen_session(session):
+    """
+    invalidates the index again when a transaction of session that wrote questions ends,
+    session is a session, a sessionmaker or a scoped_session such as db.session
+    """
+    if not event.contains(session, "after_commit", invalidate_after_transaction):
+        event.listen(session, "after_begin", track_session_connection)
+        event.listen(session, "after_commit", invalidate_after_transaction)
+        event.listen(session, "after_rollback", invalidate_after_transaction)
+
+
+def init_search():
+    """
+    keeps the in-process index up to date with the writes made through sqlalchemy,
+    the index is invalidated when the questions are written and again when the db.session transaction ends
+    """
+    if not event.contains(Engine, "after_cursor_execute", invalidate_on_question_writes):
+        event.listen(Engine, "after_cursor_execute", invalidate_on_question_writes)
+    listen_session(db.session)
+
+
+def find_questions(term, page=1, per_page=10, category=None):
+    """
+    Returns a page of the questions whose question or answer contain all the words of term,
+    ranked by relevance, and the count of all the matching questions.
+    Postgres searches with the GIN index of the question and answer text and counts the matches
+    in the same query, other databases search the in-process QuestionIndex.
+    A term without words matches every question, ordered by id.
+    category (a category id) restricts the search to the questions of that category.
+    """
+    words = tokenize(term)
+    offset = (page - 1) * per_page
+
+    if not words:
+        query = Question.query
+        if category is not None:
+            query = query.filter(Question.category == category)
+        questions = query.order_by(Question.id).offset(offset).limit(per_page).all()
+        return questions, query.count()
+
+    if db.engine.dialect.name == "postgresql":
+        return search_postgres(words, offset, per_page, category)
+
+    question_ids, total = question_index.search(
+        words, category, limit=offset + per_page
+    )
+    question_ids = question_ids[offset:]
+    if not question_ids:
+        return [], total
+    questions = {question.id: question for question in Question.query.filter(Question.id.in_(question_ids))}
+    # a question deleted since the index was built is skipped
+    return [questions[question_id] for question_id in question_ids if question_id in questions], total
+
+
+def search_postgres(words, offset, limit, category):
+    vector = literal_column(f"({SEARCH_VECTOR_SQL})")
+    # all the words, the last one as a prefix
+    query_text = " & ".join(words[:-1] + [words[-1] + ":*"])
+    ts_query = func.to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), query_text)
+    rank = func.ts_rank_cd(vector, ts_query)
+
+    query = db.session.query(Question, func.count().over().label("total")).filter(vector.op("@@")(ts_query))
+    if category is not None:
+        query = query.filter(Question.category == category)
+    rows = query.order_by(rank.desc(), Question.id).offset(offset).limit(limit).all()
+    if rows:
+        return [question for question, _ in rows], rows[0].total
+    # the page is past the last match, count the matches only then
+    return [], query.count() if offset else 0
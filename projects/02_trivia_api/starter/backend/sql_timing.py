@@ -0,0 +1,76 @@
+""" Per-request SQL statement count and database time, and a slow query log.
+
+init_sql_timing(app, db) listens to the statements of the engine of db (a flask_sqlalchemy.SQLAlchemy) for app,
+other engines of the process (tests, benchmarks) are not timed. Each response gets a header like
+  Server-Timing: db;dur=12.40;desc="7 statements"
+(the browser developer tools show it in the timing of the request), and every statement slower than
+SLOW_QUERY_THRESHOLD_MS milliseconds (app config or environment variable, default 100) is logged
+with the endpoint of the request that issued it.
+
+Every project of the repository is installed and deployed on its own, so each one has a copy of this module.
+The copies must stay identical, projects/test_shared_modules.py compares them and tests every copy.
+"""
+import os
+import time
+import logging
+
+from flask import g, request, current_app, has_request_context
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# slow statements are logged up to this many characters
+MAX_LOGGED_STATEMENT_LENGTH = 2000
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('sql_timing_started', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['sql_timing_started'].pop()
+    if not has_request_context():
+        return
+    g.sql_statements = g.get('sql_statements', 0) + 1
+    g.sql_seconds = g.get('sql_seconds', 0.0) + seconds
+
+    threshold = current_app.config.get('SLOW_QUERY_THRESHOLD_MS')
+    if threshold is not None and seconds * 1000 >= threshold:
+        logger.warning('Slow query (%.1f ms) in %s %s [%s]: %s', seconds * 1000, request.method, request.path,
+            request.endpoint, statement[:MAX_LOGGED_STATEMENT_LENGTH])
+
+
+def handle_error(exception_context):
+    # a failed statement never reaches after_cursor_execute
+    started = exception_context.connection.info.get('sql_timing_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def listen(engine):
+    """ Times the statements of engine, once however many times it is called """
+    if not event.contains(engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(engine, 'handle_error', handle_error)
+
+
+def init_sql_timing(app, db):
+    """ Counts the statements and the database time of the requests of app, see the module docstring """
+    threshold = os.getenv('SLOW_QUERY_THRESHOLD_MS')
+    app.config.setdefault('SLOW_QUERY_THRESHOLD_MS', float(threshold) if threshold else 100)
+
+    @app.before_request
+    def reset_sql_timing():
+        # flask_sqlalchemy creates the engine on first use, and creates a new one if the database url changes
+        listen(db.engine)
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+
+    @app.after_request
+    def add_server_timing(response):
+        statements = g.get('sql_statements', 0)
+        response.headers.add('Server-Timing',
+            'db;dur={:.2f};desc="{} statement{}"'.format(
+                g.get('sql_seconds', 0.0) * 1000, statements, '' if statements == 1 else 's'))
+        return response
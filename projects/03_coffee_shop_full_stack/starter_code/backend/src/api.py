@@ -2,13 +2,20 @@ import os
 from flask import Flask, request, jsonify, abort
 from sqlalchemy import exc
 import json
+import time
+import hashlib
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from .database.models import db, db_drop_and_create_all, setup_db, Drink, get_menu_version
+from .database.sql_timing import init_sql_timing
 from .auth.auth import AuthError, requires_auth
 
 app = Flask(__name__)
+# seconds a cached menu is served before it is rebuilt, see menu_cache
+app.config['MENU_CACHE_SECONDS'] = float(os.getenv('MENU_CACHE_SECONDS', 60))
 setup_db(app)
+# the statement count and database time of each request are sent in the Server-Timing header
+init_sql_timing(app, db)
 CORS(app)
 
 '''
@@ -18,6 +25,17 @@ CORS(app)
 '''
 # db_drop_and_create_all()
 
+'''
+menu_cache
+    the encoded body and etag of the public GET /drinks response as one (version, expires, body, etag) tuple,
+    version is the menu version it was built from, see get_menu_version(), and expires the time.monotonic()
+    after which it is rebuilt. The tuple is replaced as a whole and read once per request,
+    so the body and etag of a response always come from the same build.
+    !!NOTE the menu version only counts the changes made by this process, the changes made by other
+    processes (other workers of the server) are served after the cached menu expires, after MENU_CACHE_SECONDS
+'''
+menu_cache = None
+
 ## ROUTES
 
 @app.route('/drinks', methods=['GET'])
@@ -29,16 +47,32 @@ def get_drinks():
             it should contain only the drink.short() data representation
         returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
             or appropriate status code indicating reason for failure
+        the encoded response is cached until a drink is inserted, updated or deleted,
+        a request with If-None-Match set to the current etag gets an empty 304 response
     '''
-    try:
-        drinks = [drink.short() for drink in Drink.query.all()]
-    except:
-        abort(500)
-
-    return 200, jsonify({
-        'success': True,
-        'drinks': drinks
-    })
+    global menu_cache
+    # read the version before querying so a change made meanwhile rebuilds the cache on the next request
+    version = get_menu_version()
+    cached = menu_cache
+    if cached is None or cached[0] != version or time.monotonic() >= cached[1]:
+        try:
+            drinks = [drink.short() for drink in Drink.query.all()]
+        except:
+            abort(500)
+
+        body = json.dumps({
+            'success': True,
+            'drinks': drinks
+        }).encode()
+        cached = (version, time.monotonic() + app.config['MENU_CACHE_SECONDS'], body, hashlib.sha1(body).hexdigest())
+        menu_cache = cached
+
+    _, _, body, etag = cached
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # clients may keep the menu but have to revalidate it with the etag
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @app.route('/drinks-details', methods=['GET'])
 def get_drink_details():
@@ -1,8 +1,10 @@
-import json
+import os
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from .jwks import JWKSCache
+from .token_cache import VerifiedTokenCache
 
 
 AUTH0_DOMAIN = 'awdnd.eu.auth0.com'
@@ -10,6 +12,13 @@ AUTH0_DOMAIN = 'awdnd.eu.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'drink'
 #'dev'
+# can be pointed to a local stand-in jwks server for testing
+JWKS_URL = os.getenv('JWKS_URL', f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+
+# the signing keys are fetched once per process instead of once per request
+jwks_cache = JWKSCache(JWKS_URL)
+# payloads of already verified tokens, a repeated token skips the signature verification
+token_cache = VerifiedTokenCache(max_size=1024)
 
 ## AuthError Exception
 '''
@@ -102,8 +111,6 @@ def verify_decode_jwt(token):
 
         !!NOTE urlopen has a common certificate error described here: https://stackoverflow.com/questions/50236117/scraping-ssl-certificate-verify-failed-error-for-http-en-wikipedia-org
     '''
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
     rsa_key = {}
     if 'kid' not in unverified_header:
@@ -112,15 +119,15 @@ def verify_decode_jwt(token):
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    key = jwks_cache.get_key(unverified_header['kid'])
+    if key:
+        rsa_key = {
+            'kty': key['kty'],
+            'kid': key['kid'],
+            'use': key['use'],
+            'n': key['n'],
+            'e': key['e']
+        }
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -163,6 +170,7 @@ def requires_auth(permission=''):
 
         it should use the get_token_auth_header method to get the token
         it should use the verify_decode_jwt method to decode the jwt
+            unless the payload of the token is in the verified token cache
         it should use the check_permissions method validate claims and check the requested permission
         return the decorator which passes the decoded payload to the decorated method
     '''
@@ -170,7 +178,10 @@ def requires_auth(permission=''):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
+            payload = token_cache.get(token)
+            if payload is None:
+                payload = verify_decode_jwt(token)
+                token_cache.put(token, payload)
             check_permissions(permission, payload)
             return f(payload, *args, **kwargs)
 
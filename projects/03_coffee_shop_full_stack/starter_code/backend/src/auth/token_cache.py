@@ -0,0 +1,85 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+'''
+VerifiedTokenCache
+a bounded LRU cache of the payloads of tokens whose signature and claims were already verified
+
+    tokens are keyed by their sha256 hash so the raw tokens are not kept in memory,
+    a cached payload is dropped once the token's exp time has passed,
+    the least recently used payload is evicted when max_size tokens are cached.
+    hits and misses count the lookups that found / did not find a payload.
+    EXAMPLE
+        payload = token_cache.get(token)
+        if payload is None:
+            payload = verify_decode_jwt(token)
+            token_cache.put(token, payload)
+'''
+class VerifiedTokenCache:
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._payloads = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    '''
+    get(token)
+        returns the cached payload of the token, or None if it is not cached or expired
+    '''
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._payloads.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if time.time() < expires_at:
+                    self._payloads.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._payloads[key]
+            self.misses += 1
+            return None
+
+    '''
+    put(token, payload)
+        caches the verified payload until the token expires,
+        tokens without an exp claim are not cached
+    '''
+    def put(self, token, payload):
+        expires_at = payload.get('exp')
+        if not isinstance(expires_at, (int, float)) or expires_at <= time.time():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._payloads[key] = (expires_at, payload)
+            self._payloads.move_to_end(key)
+            while len(self._payloads) > self.max_size:
+                self._payloads.popitem(last=False)
+
+    '''
+    stats()
+        returns the hit and miss counters and the number of cached tokens
+    '''
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._payloads)
+            }
+
+    def clear(self):
+        with self._lock:
+            self._payloads.clear()
+            self.hits = 0
+            self.misses = 0
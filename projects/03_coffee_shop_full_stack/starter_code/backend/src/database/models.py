@@ -1,13 +1,15 @@
 import os
+from functools import lru_cache
 from sqlalchemy import Column, String, Integer
-from flask_sqlalchemy import SQLAlchemy
+from .db_pool import PooledSQLAlchemy
 import json
 
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
 database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
 
-db = SQLAlchemy()
+# the connection pool is configured by the DATABASE_POOL_* settings, see db_pool.py
+db = PooledSQLAlchemy()
 
 '''
 setup_db(app)
@@ -29,6 +31,35 @@ def db_drop_and_create_all():
     db.drop_all()
     db.create_all()
 
+'''
+get_menu_version()
+    returns the version of the drinks menu, it is incremented whenever a drink is
+    inserted, updated or deleted, caches built from the menu compare it to the version they were built from
+'''
+_menu_version = 0
+
+def get_menu_version():
+    return _menu_version
+
+def bump_menu_version():
+    global _menu_version
+    _menu_version += 1
+
+'''
+decode_recipe(recipe)
+    returns the recipe blob decoded, and its short form projection
+    the decoded recipes are kept for the whole process by recipe blob, every request loads new Drink instances
+    but a recipe is only decoded again once it changes (a changed recipe is a different blob)
+    !!NOTE the returned lists are shared between calls, do not modify them
+'''
+RECIPE_CACHE_SIZE = 1024
+
+@lru_cache(maxsize=RECIPE_CACHE_SIZE)
+def decode_recipe(recipe):
+    decoded = json.loads(recipe)
+    short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in decoded]
+    return decoded, short_recipe
+
 '''
 Drink
 a persistent drink entity, extends the base SQLAlchemy Model
@@ -42,13 +73,19 @@ class Drink(db.Model):
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
     recipe =  Column(String(180), nullable=False)
 
+    '''
+    parsed_recipe()
+        returns the recipe blob decoded, and its short form projection, see decode_recipe()
+    '''
+    def parsed_recipe(self):
+        return decode_recipe(self.recipe)
+
     '''
     short()
         short form representation of the Drink model
     '''
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
+        _, short_recipe = self.parsed_recipe()
         return {
             'id': self.id,
             'title': self.title,
@@ -60,10 +97,11 @@ class Drink(db.Model):
         long form representation of the Drink model
     '''
     def long(self):
+        recipe, _ = self.parsed_recipe()
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': recipe
         }
 
     '''
@@ -78,6 +116,7 @@ class Drink(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        bump_menu_version()
 
     '''
     delete()
@@ -90,6 +129,7 @@ class Drink(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        bump_menu_version()
 
     '''
     update()
@@ -102,6 +142,7 @@ class Drink(db.Model):
     '''
     def update(self):
         db.session.commit()
+        bump_menu_version()
 
     def __repr__(self):
         return json.dumps(self.short())
\ No newline at end of file
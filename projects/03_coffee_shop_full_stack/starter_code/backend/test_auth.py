@@ -0,0 +1,231 @@
+import json
+import time
+import base64
+import threading
+import unittest
+from flask import Flask
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from Crypto.PublicKey import RSA
+from jose import jwt
+
+from src.auth import auth
+from src.auth.jwks import JWKSCache
+from src.auth.token_cache import VerifiedTokenCache
+
+
+def b64url_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def make_signing_key(kid):
+    '''
+    Generates an rsa key pair, returns the private key in pem format
+    and the public key as a jwk with the given kid.
+    '''
+    key = RSA.generate(2048)
+    jwk = {
+        'kty': 'RSA',
+        'kid': kid,
+        'use': 'sig',
+        'n': b64url_uint(key.n),
+        'e': b64url_uint(key.e)
+    }
+    return key.exportKey('PEM').decode(), jwk
+
+
+class JWKSServer:
+    '''
+    A local stand-in for the auth0 /.well-known/jwks.json url,
+    it serves the keys in self.keys after self.delay seconds and counts the requests it receives.
+    '''
+    def __init__(self):
+        self.keys = []
+        self.requests = 0
+        self.delay = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.delay)
+                body = json.dumps({'keys': server.keys}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/.well-known/jwks.json'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class JWKSCacheTestCase(unittest.TestCase):
+    """This class represents the jwks cache test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.private_key, cls.jwk = make_signing_key('key-1')
+        cls.rotated_private_key, cls.rotated_jwk = make_signing_key('key-2')
+
+    def setUp(self):
+        self.server = JWKSServer()
+        self.server.keys = [self.jwk]
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_keys_are_fetched_once(self):
+        cache = JWKSCache(self.server.url)
+        for _ in range(10):
+            self.assertEqual(cache.get_key('key-1'), self.jwk)
+        self.assertEqual(self.server.requests, 1)
+
+    def get_key_concurrently(self, cache, kid, count=10):
+        keys = []
+        threads = [threading.Thread(target=lambda: keys.append(cache.get_key(kid))) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return keys
+
+    def test_concurrent_first_lookups_fetch_once(self):
+        self.server.delay = 0.2
+        cache = JWKSCache(self.server.url)
+        self.assertEqual(self.get_key_concurrently(cache, 'key-1'), [self.jwk] * 10)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_concurrent_expired_lookups_fetch_once(self):
+        cache = JWKSCache(self.server.url, ttl=0.2, background_refresh=False)
+        cache.get_key('key-1')
+        self.server.delay = 0.2
+        time.sleep(0.25)
+        self.assertEqual(self.get_key_concurrently(cache, 'key-1'), [self.jwk] * 10)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        cache = JWKSCache(self.server.url, min_refetch_interval=60)
+        cache.get_key('key-1')
+        for _ in range(10):
+            self.assertIsNone(cache.get_key('unknown'))
+        # the first load plus a single forced refetch
+        self.assertEqual(self.server.requests, 2)
+
+    def test_unknown_kid_picks_up_rotated_key(self):
+        cache = JWKSCache(self.server.url, min_refetch_interval=0)
+        cache.get_key('key-1')
+        self.server.keys = [self.jwk, self.rotated_jwk]
+        self.assertEqual(cache.get_key('key-2'), self.rotated_jwk)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_expired_keys_are_refreshed_in_background(self):
+        cache = JWKSCache(self.server.url, ttl=0.5)
+        cache.get_key('key-1')
+        self.server.keys = [self.rotated_jwk]
+        time.sleep(0.6)
+        # the stale key is served while the refresh runs
+        self.assertEqual(cache.get_key('key-1'), self.jwk)
+        deadline = time.monotonic() + 5
+        while cache._refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(cache.get_key('key-2'), self.rotated_jwk)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_verify_decode_jwt_uses_cache(self):
+        original_cache = auth.jwks_cache
+        auth.jwks_cache = JWKSCache(self.server.url)
+        try:
+            claims = {
+                'iss': f'https://{auth.AUTH0_DOMAIN}/',
+                'aud': auth.API_AUDIENCE,
+                'exp': int(time.time()) + 3600,
+                'permissions': ['get:drinks-detail']
+            }
+            token = jwt.encode(claims, self.private_key, algorithm='RS256', headers={'kid': 'key-1'})
+            for _ in range(5):
+                payload = auth.verify_decode_jwt(token)
+                self.assertEqual(payload['permissions'], ['get:drinks-detail'])
+            self.assertEqual(self.server.requests, 1)
+        finally:
+            auth.jwks_cache = original_cache
+
+
+
+class VerifiedTokenCacheTestCase(unittest.TestCase):
+    """This class represents the verified token cache test case"""
+
+    def test_hits_and_misses(self):
+        cache = VerifiedTokenCache()
+        payload = {'exp': time.time() + 60, 'permissions': []}
+        self.assertIsNone(cache.get('token'))
+        cache.put('token', payload)
+        self.assertEqual(cache.get('token'), payload)
+        self.assertEqual(cache.get('token'), payload)
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['size'], 1)
+
+    def test_expired_tokens_are_dropped(self):
+        cache = VerifiedTokenCache()
+        cache.put('expiring', {'exp': time.time() + 0.2})
+        cache.put('expired', {'exp': time.time() - 1})
+        cache.put('no-exp', {})
+        self.assertIsNotNone(cache.get('expiring'))
+        self.assertIsNone(cache.get('expired'))
+        self.assertIsNone(cache.get('no-exp'))
+        time.sleep(0.3)
+        self.assertIsNone(cache.get('expiring'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = VerifiedTokenCache(max_size=2)
+        exp = time.time() + 60
+        cache.put('a', {'exp': exp})
+        cache.put('b', {'exp': exp})
+        cache.get('a')
+        cache.put('c', {'exp': exp})
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_requires_auth_verifies_token_once(self):
+        app = Flask(__name__)
+        verified = []
+        payload = {'exp': time.time() + 60, 'permissions': ['get:drinks-detail']}
+
+        def verify_decode_jwt(token):
+            verified.append(token)
+            return payload
+
+        @auth.requires_auth('get:drinks-detail')
+        def handler(payload):
+            return payload
+
+        original_verify, original_cache = auth.verify_decode_jwt, auth.token_cache
+        auth.verify_decode_jwt, auth.token_cache = verify_decode_jwt, VerifiedTokenCache()
+        try:
+            for _ in range(5):
+                with app.test_request_context(headers={'Authorization': 'Bearer some.jwt.token'}):
+                    self.assertEqual(handler(), payload)
+            with app.test_request_context(headers={'Authorization': 'Bearer some.jwt.token'}):
+                with self.assertRaises(auth.AuthError):
+                    auth.requires_auth('delete:drinks')(handler)()
+        finally:
+            auth.verify_decode_jwt, auth.token_cache = original_verify, original_cache
+
+        self.assertEqual(verified, ['some.jwt.token'])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import json
+import time
+import hashlib
+import unittest
+
+from src import api
+from src.database.models import db, Drink, decode_recipe
+
+
+class MenuCacheTestCase(unittest.TestCase):
+    """This class represents the cached GET /drinks menu test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        # an in-memory database instead of the database.db file of the app
+        api.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        cls.client = api.app.test_client
+
+    def setUp(self):
+        api.app.config['MENU_CACHE_SECONDS'] = 60
+        api.menu_cache = None
+        db.drop_all()
+        db.create_all()
+        Drink(title='Water', recipe=json.dumps([{'name': 'water', 'color': 'blue', 'parts': 1}])).insert()
+
+    def tearDown(self):
+        db.session.remove()
+
+    def get_menu(self, etag=None):
+        headers = {'If-None-Match': f'"{etag}"'} if etag else {}
+        return self.client().get('/drinks', headers=headers)
+
+    def test_etag_matches_body(self):
+        res = self.get_menu()
+        etag, _ = res.get_etag()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(etag, hashlib.sha1(res.data).hexdigest())
+        self.assertEqual([drink['title'] for drink in json.loads(res.data)['drinks']], ['Water'])
+
+    def test_not_modified(self):
+        etag, _ = self.get_menu().get_etag()
+        res = self.get_menu(etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
+    def test_insert_update_delete_invalidate(self):
+        etags = [self.get_menu().get_etag()[0]]
+
+        drink = Drink(title='Milk', recipe=json.dumps([{'name': 'milk', 'color': 'white', 'parts': 1}]))
+        drink.insert()
+        drink_id = drink.id
+        res = self.get_menu(etags[-1])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(json.loads(res.data)['drinks']), 2)
+        etags.append(res.get_etag()[0])
+
+        # the session of the test was removed at the end of the request
+        drink = Drink.query.get(drink_id)
+        drink.title = 'Oat milk'
+        drink.update()
+        res = self.get_menu(etags[-1])
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('Oat milk', [drink['title'] for drink in json.loads(res.data)['drinks']])
+        etags.append(res.get_etag()[0])
+
+        Drink.query.get(drink_id).delete()
+        res = self.get_menu(etags[-1])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(json.loads(res.data)['drinks']), 1)
+        self.assertEqual(res.get_etag()[0], etags[0])
+
+    def test_changes_of_other_processes_are_served_after_expiry(self):
+        api.app.config['MENU_CACHE_SECONDS'] = 0.2
+        etag, _ = self.get_menu().get_etag()
+        # a row written without the menu version of this process changing, as another worker would
+        db.session.execute(Drink.__table__.insert(), {
+            'title': 'Tea', 'recipe': json.dumps([{'name': 'tea', 'color': 'brown', 'parts': 1}])})
+        db.session.commit()
+
+        self.assertEqual(self.get_menu(etag).status_code, 304)
+        time.sleep(0.25)
+        res = self.get_menu(etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(json.loads(res.data)['drinks']), 2)
+
+
+class DrinkRecipeTestCase(unittest.TestCase):
+    """This class represents the decoded drink recipes test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        # an in-memory database instead of the database.db file of the app
+        api.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        cls.client = api.app.test_client
+
+    def setUp(self):
+        api.menu_cache = None
+        db.drop_all()
+        db.create_all()
+        drink = Drink(title='Water', recipe=json.dumps([{'name': 'water', 'color': 'blue', 'parts': 1}]))
+        drink.insert()
+        self.drink_id = drink.id
+        db.session.remove()
+        decode_recipe.cache_clear()
+
+    def tearDown(self):
+        db.session.remove()
+
+    def test_recipe_is_decoded_once(self):
+        for _ in range(3):
+            # every request loads new Drink instances
+            api.menu_cache = None
+            res = self.client().get('/drinks')
+            self.assertEqual(json.loads(res.data)['drinks'][0]['recipe'], [{'color': 'blue', 'parts': 1}])
+        self.assertEqual(Drink.query.get(self.drink_id).long()['recipe'][0]['name'], 'water')
+        info = decode_recipe.cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.hits, 3)
+
+    def test_updated_recipe_is_decoded(self):
+        Drink.query.get(self.drink_id).short()
+        drink = Drink.query.get(self.drink_id)
+        drink.recipe = json.dumps([{'name': 'sparkling water', 'color': 'clear', 'parts': 2}])
+        drink.update()
+        db.session.remove()
+
+        drink = Drink.query.get(self.drink_id)
+        self.assertEqual(drink.short()['recipe'], [{'color': 'clear', 'parts': 2}])
+        self.assertEqual(drink.long()['recipe'][0]['name'], 'sparkling water')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
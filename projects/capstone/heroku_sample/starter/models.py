@@ -1,10 +1,11 @@
 from sqlalchemy import Column, String, create_engine
-from flask_sqlalchemy import SQLAlchemy
+from db_pool import PooledSQLAlchemy
 import json
 
 database_path = os.environ['DATABASE_URL']
 
-db = SQLAlchemy()
+# the connection pool is configured by the DATABASE_POOL_* settings, see db_pool.py
+db = PooledSQLAlchemy()
 
 '''
 setup_db(app)
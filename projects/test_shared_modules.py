@@ -0,0 +1,229 @@
+"""
+Tests of the modules copied unchanged into several projects, each project is installed and deployed on its own.
+Every copy is compared to the others and runs the same tests, from this directory:
+    python -m pytest -q test_shared_modules.py
+The JWKS cache is only compared here, the coffee shop test_auth.py tests it.
+"""
+import os
+import time
+import filecmp
+import tempfile
+import threading
+import unittest
+import importlib.util
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine
+from sqlalchemy.engine.url import make_url
+
+PROJECTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# the copies of each shared module, by project
+SHARED_MODULES = {
+    'db_pool': {
+        'fyyur': '01_fyyur/starter_code/db_pool.py',
+        'trivia': '02_trivia_api/starter/backend/db_pool.py',
+        'coffee_shop': '03_coffee_shop_full_stack/starter_code/backend/src/database/db_pool.py',
+        'capstone': 'capstone/heroku_sample/starter/db_pool.py',
+    },
+    'sql_timing': {
+        'fyyur': '01_fyyur/starter_code/sql_timing.py',
+        'trivia': '02_trivia_api/starter/backend/sql_timing.py',
+        'coffee_shop': '03_coffee_shop_full_stack/starter_code/backend/src/database/sql_timing.py',
+    },
+    'jwks': {
+        'coffee_shop': '03_coffee_shop_full_stack/starter_code/backend/src/auth/jwks.py',
+        'basic_flask_auth': '../BasicFlaskAuth/jwks.py',
+    },
+}
+
+
+def load_copy(module, project):
+    """ Imports the copy of module of project under its own name, e.g. fyyur_db_pool """
+    name = f'{project}_{module}'
+    spec = importlib.util.spec_from_file_location(name, os.path.join(PROJECTS_DIR, SHARED_MODULES[module][project]))
+    copy = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(copy)
+    return copy
+
+
+def copies_test_cases(module, *test_classes):
+    """ Returns a test case class for every copy of module and every test class, with the copy in self.module """
+    return {
+        f'{test_class.__name__}_{project}': type(f'{test_class.__name__}_{project}', (test_class, unittest.TestCase),
+            {'module': load_copy(module, project)})
+        for project in SHARED_MODULES[module] for test_class in test_classes
+    }
+
+
+class SharedModulesTestCase(unittest.TestCase):
+    """This class represents the identical copies test case"""
+
+    def test_copies_are_identical(self):
+        for module, copies in SHARED_MODULES.items():
+            paths = [os.path.join(PROJECTS_DIR, path) for path in copies.values()]
+            for path in paths[1:]:
+                with self.subTest(path=path):
+                    self.assertTrue(filecmp.cmp(paths[0], path, shallow=False),
+                        f'{path} differs from {paths[0]}, copy the change to every project')
+
+
+class PoolMetricsTests:
+    """This class represents the connection pool metrics test case"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.metrics = self.module.PoolMetrics(leak_warning_seconds=0.1)
+        self.engine = create_engine(
+            'sqlite:///' + os.path.join(self.directory.name, 'pool.db'),
+            poolclass=self.module.InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=5,
+            metrics=self.metrics, pool_events=self.metrics.events(),
+            connect_args={'check_same_thread': False})
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def test_checkouts_are_counted(self):
+        for _ in range(3):
+            with self.engine.connect() as connection:
+                connection.execute('SELECT 1')
+        stats = self.metrics.stats()
+        self.assertEqual(stats['checkouts'], 3)
+        self.assertEqual(stats['waits'], 0)
+        self.assertEqual(stats['checked_out'], 0)
+
+    def test_checkout_waits_for_busy_pool(self):
+        connection = self.engine.connect()
+        threading.Timer(0.2, connection.close).start()
+
+        with self.engine.connect():
+            pass
+
+        stats = self.metrics.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreaterEqual(stats['checkout_seconds_max'], 0.15)
+
+    def test_held_connections_are_reported(self):
+        emitted = []
+        self.metrics.emit = lambda name, value: emitted.append(name)
+        connection = self.engine.connect()
+        time.sleep(0.15)
+        with self.assertLogs(self.module.logger, level='WARNING') as logs:
+            self.metrics.warn_leaks()
+            # warned once per connection
+            self.metrics.warn_leaks()
+            connection.close()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('still checked out', logs.output[0])
+        self.assertEqual(self.metrics.stats()['leak_warnings'], 1)
+        self.assertIn('db.pool.leak_warnings', emitted)
+        self.assertIn('db.pool.checkout_seconds', emitted)
+
+
+class PooledSQLAlchemyTests:
+    """This class represents the pool settings test case"""
+
+    def test_settings_come_from_config_then_environment(self):
+        os.environ['DATABASE_MAX_OVERFLOW'] = '3'
+        try:
+            settings = self.module.pool_settings({'DATABASE_POOL_SIZE': 20, 'DATABASE_POOL_PRE_PING': False})
+        finally:
+            del os.environ['DATABASE_MAX_OVERFLOW']
+        self.assertEqual(settings['DATABASE_POOL_SIZE'], 20)
+        self.assertEqual(settings['DATABASE_MAX_OVERFLOW'], 3)
+        self.assertFalse(settings['DATABASE_POOL_PRE_PING'])
+        self.assertEqual(settings['DATABASE_POOL_RECYCLE'], 1800)
+
+    def test_pre_ping_environment_values(self):
+        for value, expected in [('1', True), ('true', True), ('Yes', True), ('0', False), ('false', False)]:
+            os.environ['DATABASE_POOL_PRE_PING'] = value
+            try:
+                with self.subTest(value=value):
+                    self.assertIs(self.module.pool_settings({})['DATABASE_POOL_PRE_PING'], expected)
+            finally:
+                del os.environ['DATABASE_POOL_PRE_PING']
+
+    def test_engine_options(self):
+        app = Flask(__name__)
+        app.config.update(DATABASE_POOL_SIZE=20, DATABASE_MAX_OVERFLOW=0, DATABASE_POOL_RECYCLE=600)
+        db = self.module.PooledSQLAlchemy(app)
+
+        options = {}
+        db.apply_driver_hacks(app, make_url('postgresql://postgres@localhost/fyyur'), options)
+        self.assertIs(options['poolclass'], self.module.InstrumentedQueuePool)
+        self.assertEqual(options['pool_size'], 20)
+        self.assertEqual(options['max_overflow'], 0)
+        self.assertEqual(options['pool_recycle'], 600)
+        self.assertIs(options['metrics'], db.pool_metrics)
+
+        options = {}
+        db.apply_driver_hacks(app, make_url('sqlite://'), options)
+        self.assertNotIn('pool_size', options)
+        self.assertNotIn('pool_recycle', options)
+        self.assertNotIn('pool_pre_ping', options)
+        self.assertEqual(options['pool_events'], db.pool_metrics.events())
+
+    def test_in_memory_sqlite_is_not_recycled(self):
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_TRACK_MODIFICATIONS=False,
+            DATABASE_POOL_RECYCLE=1)
+        db = self.module.PooledSQLAlchemy(app)
+        with app.app_context():
+            db.session.execute('CREATE TABLE kept (id INTEGER)')
+            db.session.commit()
+            db.session.remove()
+            # the only connection of the in-memory database is older than the recycle time
+            time.sleep(1.1)
+            self.assertEqual(db.session.execute('SELECT count(*) FROM kept').scalar(), 0)
+
+
+class SqlTimingTests:
+    """This class represents the per-request statement timing test case"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_TRACK_MODIFICATIONS=False)
+        self.db = SQLAlchemy(self.app)
+        self.module.init_sql_timing(self.app, self.db)
+        self.other_engine = create_engine('sqlite://')
+
+        @self.app.route('/statements/<int:count>')
+        def statements(count):
+            for _ in range(count):
+                self.db.session.execute('SELECT 1')
+            # a statement of another engine of the process is not counted
+            self.other_engine.execute('SELECT 1')
+            return ''
+
+    def tearDown(self):
+        self.other_engine.dispose()
+
+    def test_server_timing_header(self):
+        client = self.app.test_client()
+        self.assertRegex(client.get('/statements/3').headers['Server-Timing'], r'^db;dur=[0-9.]+;desc="3 statements"$')
+        self.assertRegex(client.get('/statements/1').headers['Server-Timing'], r'^db;dur=[0-9.]+;desc="1 statement"$')
+
+    def test_only_the_app_engine_is_timed(self):
+        self.app.test_client().get('/statements/1')
+        with self.app.app_context():
+            self.assertTrue(self.module.event.contains(self.db.engine, 'before_cursor_execute',
+                self.module.before_cursor_execute))
+        self.assertFalse(self.module.event.contains(self.other_engine, 'before_cursor_execute',
+            self.module.before_cursor_execute))
+
+    def test_slow_queries_are_logged(self):
+        self.app.config['SLOW_QUERY_THRESHOLD_MS'] = 0
+        with self.assertLogs(self.module.logger, level='WARNING') as logs:
+            self.app.test_client().get('/statements/2')
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn('GET /statements/2 [statements]: SELECT 1', logs.output[0])
+
+
+globals().update(copies_test_cases('db_pool', PoolMetricsTests, PooledSQLAlchemyTests))
+globals().update(copies_test_cases('sql_timing', SqlTimingTests))
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()